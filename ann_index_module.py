@@ -0,0 +1,111 @@
+"""
+ann_index_module.py - Approximate nearest-neighbour index (IVF)
+
+Track feature vectors are partitioned into coarse k-means clusters
+("lists"). A query only looks at the rows of the n_probes lists closest
+to it, so recall trades off against speed through n_lists and n_probes.
+The index only prunes candidates; exact scores are left to the caller.
+"""
+
+import numpy as np
+
+# Metrics the coarse quantizer understands
+ANN_METRICS = ['cosine', 'euclidean']
+
+# Rows assigned to clusters per block while building
+ASSIGN_CHUNK_SIZE = 4096
+
+
+def _normalize_rows(matrix):
+    """Scale rows to unit length, leaving zero rows at zero"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class IVFIndex:
+    """Inverted-file index over the rows of a feature matrix"""
+
+    def __init__(self, metric='cosine', n_lists=None, n_probes=8, train_size=50000,
+                 n_iter=10, seed=0):
+        if metric not in ANN_METRICS:
+            raise ValueError(f"ANN index supports {', '.join(ANN_METRICS)}, not {metric}")
+        self.metric = metric
+        self.n_lists = n_lists
+        self.n_probes = n_probes
+        self.train_size = train_size
+        self.n_iter = n_iter
+        self.seed = seed
+
+        self.centroids = None
+        self.list_offsets = None
+        self.list_rows = None
+
+    def _prepare(self, matrix):
+        """Map raw features into the space the clusters live in"""
+        matrix = np.asarray(matrix, dtype=np.float64)
+        # NaN features cannot be clustered; they land in whichever list is nearest to zero
+        matrix = np.nan_to_num(matrix)
+        if self.metric == 'cosine':
+            return _normalize_rows(matrix)
+        return matrix
+
+    def _nearest_lists(self, points, count):
+        """Indices of the count closest centroids for each point, closest first"""
+        if self.metric == 'cosine':
+            distance = -(points @ self.centroids.T)
+        else:
+            # |x|^2 is the same for every centroid, so it does not change the ranking
+            distance = np.square(self.centroids).sum(axis=1) - 2 * points @ self.centroids.T
+        if count == 1:
+            return distance.argmin(axis=1)[:, None]
+        if count >= distance.shape[1]:
+            return np.argsort(distance, axis=1)
+        nearest = np.argpartition(distance, count - 1, axis=1)[:, :count]
+        order = np.take_along_axis(distance, nearest, axis=1).argsort(axis=1)
+        return np.take_along_axis(nearest, order, axis=1)
+
+    def _assign(self, points):
+        """Nearest list of every point, computed block by block"""
+        assignment = np.empty(len(points), dtype=np.int64)
+        for start in range(0, len(points), ASSIGN_CHUNK_SIZE):
+            block = self._prepare(points[start:start + ASSIGN_CHUNK_SIZE])
+            assignment[start:start + len(block)] = self._nearest_lists(block, 1)[:, 0]
+        return assignment
+
+    def _train(self, train, n_lists, rng):
+        """Lloyd's k-means on the training sample, seeded with random points"""
+        self.centroids = train[rng.choice(len(train), size=n_lists, replace=False)]
+        for _ in range(self.n_iter):
+            assignment = self._assign(train)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, train)
+            # Empty lists keep their previous centroid
+            filled = counts > 0
+            self.centroids[filled] = sums[filled] / counts[filled, None]
+            if self.metric == 'cosine':
+                self.centroids = _normalize_rows(self.centroids)
+
+    def build(self, features):
+        """Train the coarse clusters and fill the inverted lists"""
+        n = len(features)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, max(n, 1))
+
+        rng = np.random.default_rng(self.seed)
+        sample = np.sort(rng.choice(n, size=min(n, max(self.train_size, n_lists)), replace=False))
+        self._train(self._prepare(features[sample]), n_lists, rng)
+
+        assignment = self._assign(features)
+        self.list_rows = np.argsort(assignment, kind='stable')
+        self.list_offsets = np.zeros(len(self.centroids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=len(self.centroids)), out=self.list_offsets[1:])
+        return self
+
+    def candidates(self, vec, n_probes=None):
+        """Rows of the lists closest to vec, in row order"""
+        n_probes = min(n_probes or self.n_probes, len(self.centroids))
+        query = self._prepare(np.asarray(vec, dtype=np.float64)[None, :])
+        probes = self._nearest_lists(query, n_probes)[0]
+        rows = [self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes.tolist()]
+        return np.sort(np.concatenate(rows))
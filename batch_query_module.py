@@ -0,0 +1,165 @@
+"""
+batch_query_module.py - Streaming bulk recommendation queries
+
+Queries are read lazily from a JSONL or CSV stream, cut into batches and
+answered on a thread pool through SimilarityCalculator.get_top_similar_many.
+At most max_in_flight batches exist at any time, so memory stays flat
+however long the input is. Results are written as each batch finishes,
+either in input order or as soon as they are ready. Records that cannot
+be parsed or name an unknown type or metric are skipped with a warning on
+stderr giving their line number.
+"""
+
+import csv
+import itertools
+import json
+import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+INPUT_FORMATS = ['auto', 'jsonl', 'csv']
+OUTPUT_FORMATS = ['jsonl', 'csv']
+ITEM_TYPES = ['artist', 'track']
+
+
+def _detect_format(lines, path=None):
+    """Guess jsonl or csv from the file extension, else from the first line"""
+    if path and path.endswith(('.jsonl', '.json', '.ndjson')):
+        return 'jsonl', lines
+    if path and path.endswith('.csv'):
+        return 'csv', lines
+    first = next(lines, '')
+    lines = itertools.chain([first], lines)
+    return ('jsonl' if first.lstrip().startswith(('{', '"')) else 'csv'), lines
+
+
+def read_queries(lines, fmt='auto', path=None, defaults=None):
+    """Yield query dicts (item, type, metric, n) from JSONL or CSV lines
+
+    JSONL lines may be plain strings or objects with an "item" key; CSV
+    files use an "item" column, or their first column. Missing fields
+    come from defaults. A bad record is skipped, not fatal.
+    """
+    from similarity_module import METRICS
+
+    defaults = defaults or {}
+    lines = iter(lines)
+    if fmt == 'auto':
+        fmt, lines = _detect_format(lines, path)
+
+    if fmt == 'jsonl':
+        records = ((line_no, line) for line_no, line in enumerate(lines, 1) if line.strip())
+    else:
+        reader = csv.reader(lines)
+        header = next(reader, None)
+        if header is None:
+            return
+        if 'item' in header:
+            records = ((reader.line_num, dict(zip(header, row))) for row in reader if row)
+        else:
+            # No header row: every line is an item in the first column
+            records = itertools.chain([(1, {'item': header[0]})] if header else [],
+                                      ((reader.line_num, {'item': row[0]}) for row in reader if row))
+
+    for line_no, record in records:
+        try:
+            if fmt == 'jsonl':
+                record = json.loads(record)
+            if not isinstance(record, dict):
+                record = {'item': record}
+            query = {
+                'item': str(record.get('item', '')).strip(),
+                'type': record.get('type') or defaults.get('type', 'artist'),
+                'metric': record.get('metric') or defaults.get('metric', 'cosine'),
+                'n': int(record.get('n') or defaults.get('n', 5))
+            }
+            if query['type'] not in ITEM_TYPES:
+                raise ValueError(f"type must be one of {', '.join(ITEM_TYPES)}")
+            if query['metric'] not in METRICS:
+                raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+            if query['n'] < 1:
+                raise ValueError("n must be at least 1")
+        except (TypeError, ValueError) as e:
+            print(f"Warning: Skipping query on line {line_no}: {e}", file=sys.stderr)
+            continue
+        yield query
+
+
+class JSONLResultWriter:
+    """One JSON object per query"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, query, results):
+        record = dict(query, results=[{'name': name, 'score': score} for name, score in results])
+        self.stream.write(json.dumps(record) + '\n')
+
+    def flush(self):
+        self.stream.flush()
+
+
+class CSVResultWriter:
+    """item,type,metric,rank,name,score rows; queries without results get no rows"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.writer = csv.writer(stream)
+        self.writer.writerow(['item', 'type', 'metric', 'rank', 'name', 'score'])
+
+    def write(self, query, results):
+        for rank, (name, score) in enumerate(results, 1):
+            self.writer.writerow([query['item'], query['type'], query['metric'], rank, name,
+                                  repr(score)])
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _answer_batch(calculator, batch):
+    """Answer one batch, one batched scan per (type, metric, n) group"""
+    results = [None] * len(batch)
+    groups = {}
+    for i, query in enumerate(batch):
+        groups.setdefault((query['type'], query['metric'], query['n']), []).append(i)
+    for (item_type, metric, top_n), members in groups.items():
+        found = calculator.get_top_similar_many([batch[i]['item'] for i in members],
+                                                item_type, metric, top_n)
+        for i, result in zip(members, found):
+            results[i] = result
+    return batch, results
+
+
+def run_queries(calculator, queries, writer, workers=1, max_in_flight=4, batch_size=256,
+                ordered=True):
+    """Answer a stream of queries and write every result; returns the query count"""
+    queries = iter(queries)
+    in_flight = deque()
+    count = 0
+
+    def emit(future):
+        nonlocal count
+        batch, results = future.result()
+        for query, result in zip(batch, results):
+            writer.write(query, result)
+        writer.flush()
+        count += len(batch)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        while True:
+            batch = list(itertools.islice(queries, batch_size))
+            if batch:
+                in_flight.append(executor.submit(_answer_batch, calculator, batch))
+            if not in_flight:
+                break
+
+            # Drain until there is room for another batch (or everything at the end)
+            while in_flight and (len(in_flight) >= max_in_flight or not batch):
+                if ordered:
+                    emit(in_flight.popleft())
+                else:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.remove(future)
+                        emit(future)
+    return count
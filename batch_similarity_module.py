@@ -0,0 +1,179 @@
+"""
+batch_similarity_module.py - Block-wise all-pairs similarity batch job
+
+The full item x item similarity matrix is never held in memory. Rows are
+taken one tile at a time, scored against the catalog one column tile at a
+time, and only the running top k per row survives each column tile. Each
+finished row tile is written out before the next one starts, so memory
+is bounded by row_tile x col_tile whatever the catalog size.
+
+Usage:
+    python batch_similarity_module.py --item-type artist --metric cosine \\
+        --top-k 10 --output artist_neighbours.csv
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from similarity_module import METRICS, top_k_many
+
+# Rows whose neighbours are searched together
+ROW_TILE = 512
+
+# Catalog rows scored against one row tile at a time
+COL_TILE = 8192
+
+OUTPUT_FORMATS = ['csv', 'npy']
+
+
+def all_pairs_top_k(matrix, metric='cosine', k=10, row_tile=ROW_TILE, col_tile=COL_TILE,
+                    start=0, stop=None):
+    """Yield (row_start, neighbour_rows, scores) for every row tile in [start, stop)
+
+    neighbour_rows and scores are (tile rows x k), best first. Only
+    neighbours scoring above zero are kept, a row is never its own
+    neighbour, and missing slots hold -1 / -inf.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric: {metric}")
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    n = len(matrix)
+    stop = n if stop is None else min(stop, n)
+
+    for row_start in range(start, stop, row_tile):
+        rows = np.asarray(matrix[row_start:min(row_start + row_tile, stop)], dtype=np.float64)
+        # A row is never its own neighbour
+        self_rows = np.arange(len(rows))
+        best_cols, best_scores = top_k_many(matrix, rows, metric, k,
+                                            (self_rows, self_rows + row_start), col_tile)
+        yield row_start, best_cols, best_scores
+
+
+class CSVNeighbourWriter:
+    """Write neighbour lists as query,rank,neighbour,score rows"""
+
+    def __init__(self, path, names):
+        self.names = names
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(['query', 'rank', 'neighbour', 'score'])
+
+    def write(self, row_start, rows, scores):
+        for i in range(len(rows)):
+            query = self.names[row_start + i]
+            for rank, (row, score) in enumerate(zip(rows[i].tolist(), scores[i].tolist()), 1):
+                if row < 0:
+                    break
+                self.writer.writerow([query, rank, self.names[row], repr(score)])
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class NpyNeighbourWriter:
+    """Write neighbour rows and scores into two memory-mapped .npy files
+
+    Produces <base>.rows.npy (int64, -1 for empty slots) and
+    <base>.scores.npy (float64, -inf for empty slots).
+    """
+
+    def __init__(self, path, n, k):
+        base = path[:-len('.npy')] if path.endswith('.npy') else path
+        self.rows = np.lib.format.open_memmap(f'{base}.rows.npy', mode='w+', dtype=np.int64,
+                                              shape=(n, k))
+        self.scores = np.lib.format.open_memmap(f'{base}.scores.npy', mode='w+', dtype=np.float64,
+                                                shape=(n, k))
+
+    def write(self, row_start, rows, scores):
+        self.rows[row_start:row_start + len(rows)] = rows
+        self.scores[row_start:row_start + len(rows)] = scores
+
+    def close(self):
+        self.rows.flush()
+        self.scores.flush()
+        del self.rows, self.scores
+
+
+def get_catalog(loader, item_type):
+    """Get (names, feature matrix) of a loaded dataset"""
+    if item_type == 'artist':
+        return loader.get_all_artists(), loader.artist_features
+    loader.get_all_tracks()
+    return loader.track_ids, loader.features
+
+
+def run_batch(loader, output_path, item_type='artist', metric='cosine', k=10, fmt='csv',
+              row_tile=ROW_TILE, col_tile=COL_TILE, progress_callback=None):
+    """Compute every item's top k neighbours and stream them to output_path
+
+    Artists are written by name and tracks by ID. Returns the number of
+    rows processed.
+    """
+    names, matrix = get_catalog(loader, item_type)
+    n = len(matrix)
+    if fmt == 'npy':
+        writer = NpyNeighbourWriter(output_path, n, k)
+    else:
+        writer = CSVNeighbourWriter(output_path, names)
+
+    done = 0
+    try:
+        for row_start, rows, scores in all_pairs_top_k(matrix, metric, k, row_tile, col_tile):
+            writer.write(row_start, rows, scores)
+            done += len(rows)
+            if progress_callback is not None:
+                progress_callback(done, done / n)
+    finally:
+        writer.close()
+    return done
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='All-pairs top-k similarity batch job')
+    parser.add_argument('--data', default='data.csv', help='dataset CSV file')
+    parser.add_argument('--item-type', choices=['artist', 'track'], default='artist')
+    parser.add_argument('--metric', choices=METRICS, default='cosine')
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--row-tile', type=int, default=ROW_TILE)
+    parser.add_argument('--col-tile', type=int, default=COL_TILE)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv')
+    parser.add_argument('--backend', choices=['memory', 'memmap'], default='memory')
+    parser.add_argument('--output', required=True, help='output file (.npy base name for npy)')
+    args = parser.parse_args(argv)
+    if args.top_k < 1:
+        parser.error('--top-k must be at least 1')
+    if args.row_tile < 1 or args.col_tile < 1:
+        parser.error('--row-tile and --col-tile must be at least 1')
+
+    from load_dataset_module import DataLoader
+
+    if not os.path.exists(args.data):
+        print(f"Data file not found: {args.data}")
+        return 1
+
+    loader = DataLoader(args.data, backend=args.backend)
+    if not loader.load_data():
+        print("Failed to load data.")
+        return 1
+
+    started = time.perf_counter()
+
+    def report(rows, fraction):
+        print(f"   ... {rows} rows done ({fraction:.0%})")
+
+    count = run_batch(loader, args.output, args.item_type, args.metric, args.top_k, args.format,
+                      args.row_tile, args.col_tile, report)
+    print(f"✅ Wrote top {args.top_k} {args.metric} neighbours of {count} {args.item_type}s "
+          f"to {args.output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+benchmark.py - Reproducible performance benchmarks across catalog sizes
+
+Builds synthetic catalogs with fixed seeds (cached under bench_data/),
+times the loader and similarity hot paths on each, and saves the results
+with machine metadata as JSON. The compare command flags operations that
+got slower than a stored baseline.
+
+Usage:
+    python benchmark.py run --sizes 10k,100k --output bench.json
+    python benchmark.py compare baseline.json bench.json --threshold 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+DEFAULT_SIZES = '10k,100k,1m,10m'
+DATA_DIR = 'bench_data'
+SEED = 1234
+
+# Tracks generated and written per block, bounds memory while generating
+GENERATE_BLOCK = 500000
+
+METRICS = ['cosine', 'euclidean', 'pearson', 'manhattan']
+ITEM_TYPES = ['artist', 'track']
+
+
+def parse_size(text):
+    """Parse a catalog size such as 10k or 1m"""
+    text = text.strip().lower()
+    scale = {'k': 1000, 'm': 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip('km')) * scale)
+
+
+def catalog_path(n, seed=SEED, data_dir=DATA_DIR):
+    return os.path.join(data_dir, f'catalog_{n}_seed{seed}.csv')
+
+
+def generate_catalog(path, n, seed=SEED):
+    """Write a synthetic catalog of n tracks; the same (n, seed) always gives the same file"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    n_artists = max(1, n // 10)
+    n_names = max(1, n // 3)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    for start in range(0, n, GENERATE_BLOCK):
+        rows = np.arange(start, min(start + GENERATE_BLOCK, n))
+        m = len(rows)
+        first = rng.integers(0, n_artists, m)
+        # Every fifth track is a collaboration between two artists
+        duet = rng.random(m) < 0.2
+        artists = [f"['Artist {a}', 'Artist {(a + 1) % n_artists}']" if d else f"['Artist {a}']"
+                   for a, d in zip(first.tolist(), duet.tolist())]
+        block = pd.DataFrame({
+            'id': [f'trk{i:09d}' for i in rows.tolist()],
+            'name': [f'Song {i % n_names}' for i in rows.tolist()],
+            'artists': artists,
+            'acousticness': rng.random(m).round(4),
+            'danceability': rng.random(m).round(4),
+            'energy': rng.random(m).round(4),
+            'liveness': rng.random(m).round(4),
+            'loudness': rng.uniform(-60, 0, m).round(3),
+            'popularity': rng.integers(0, 100, m),
+            'speechiness': rng.random(m).round(4),
+            'tempo': rng.uniform(60, 200, m).round(3),
+            'valence': rng.random(m).round(4)
+        })
+        block.to_csv(tmp_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    os.replace(tmp_path, path)
+
+
+def ensure_catalog(n, seed=SEED, data_dir=DATA_DIR):
+    """Get the path of a synthetic catalog, generating it on first use"""
+    path = catalog_path(n, seed, data_dir)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        print(f"Generating {n} track catalog -> {path}")
+        generate_catalog(path, n, seed)
+    return path
+
+
+def machine_metadata():
+    """Describe the machine and code version a run was measured on"""
+    meta = {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    try:
+        import pandas as pd
+        meta['pandas'] = pd.__version__
+    except ImportError:
+        pass
+    try:
+        meta['git_commit'] = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        pass
+    return meta
+
+
+def summarize(durations):
+    """Summary statistics of per-call durations in seconds, reported in ms"""
+    ms = np.asarray(durations) * 1000
+    return {
+        'calls': len(ms),
+        'median_ms': float(np.median(ms)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'min_ms': float(ms.min()),
+        'total_ms': float(ms.sum())
+    }
+
+
+def time_calls(fn, args_list):
+    """Call fn once per argument tuple and return the per-call durations"""
+    durations = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+def bench_catalog(n, queries=50, top_k_queries=10, seed=SEED, data_dir=DATA_DIR):
+    """Time every benchmarked operation on one catalog size"""
+    from dataset_cache_module import snapshot_path
+    from load_dataset_module import DataLoader
+    from similarity_module import SimilarityCalculator
+
+    path = ensure_catalog(n, seed, data_dir)
+    results = {}
+
+    # Cold load parses the CSV; warm load restores the binary snapshot
+    loader = DataLoader(path, use_snapshot=False)
+    results[f'{n}/load_data_csv'] = summarize(time_calls(loader.load_data, [()]))
+    if not os.path.exists(snapshot_path(path)):
+        DataLoader(path).load_data()
+    loader = DataLoader(path)
+    results[f'{n}/load_data_snapshot'] = summarize(time_calls(loader.load_data, [()]))
+
+    # The result cache would turn repeated queries into lookups
+    calculator = SimilarityCalculator(loader, cache_size=0)
+    rng = np.random.default_rng(seed)
+    track_rows = rng.integers(0, len(loader.track_ids), queries).tolist()
+    track_ids = [loader.track_ids[row] for row in track_rows]
+    track_names = [loader.track_names[row] for row in track_rows]
+    artists = loader.get_all_artists()
+    artist_names = [artists[i] for i in rng.integers(0, len(artists), queries).tolist()]
+
+    results[f'{n}/get_track_by_id'] = summarize(
+        time_calls(loader.get_track_by_id, [(track_id,) for track_id in track_ids]))
+    results[f'{n}/get_tracks_by_name'] = summarize(
+        time_calls(loader.get_tracks_by_name, [(name,) for name in track_names]))
+    results[f'{n}/search_artists'] = summarize(
+        time_calls(loader.search_artists, [(name[:-1],) for name in artist_names[:top_k_queries]]))
+
+    items = {'track': track_ids, 'artist': artist_names}
+    for item_type in ITEM_TYPES:
+        pairs = list(zip(items[item_type], items[item_type][1:]))
+        for metric in METRICS:
+            results[f'{n}/compute_similarity/{item_type}/{metric}'] = summarize(time_calls(
+                calculator.compute_similarity, [(a, b, item_type, metric) for a, b in pairs]))
+            # The first call builds lazy indexes (KD-trees); keep it out of the steady state
+            calculator.get_top_similar(items[item_type][0], item_type, metric, 5)
+            results[f'{n}/get_top_similar/{item_type}/{metric}'] = summarize(time_calls(
+                calculator.get_top_similar,
+                [(item, item_type, metric, 5) for item in items[item_type][1:top_k_queries + 1]]))
+    return results
+
+
+def run(args):
+    sizes = [parse_size(size) for size in args.sizes.split(',') if size.strip()]
+    report = {'meta': machine_metadata(), 'seed': args.seed, 'sizes': sizes, 'results': {}}
+    for n in sizes:
+        print(f"\n=== {n} tracks ===")
+        results = bench_catalog(n, args.queries, args.top_k_queries, args.seed, args.data_dir)
+        for name, stats in results.items():
+            print(f"   {name:<45} median {stats['median_ms']:10.3f} ms   "
+                  f"p95 {stats['p95_ms']:10.3f} ms")
+        report['results'].update(results)
+
+        # Save after every size so a long run keeps what it measured
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"\n✅ Results saved to {args.output}")
+    return 0
+
+
+def compare(args):
+    """Print a baseline vs current table and return 1 if anything regressed"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    regressions = []
+    print(f"{'operation':<45} {'baseline ms':>12} {'current ms':>12} {'change':>8}")
+    for name, stats in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        before, after = base['median_ms'], stats['median_ms']
+        change = (after - before) / before if before > 0 else 0.0
+        # Differences below min_ms are timer noise whatever the ratio
+        regressed = change > args.threshold and after - before > args.min_ms
+        flag = '  REGRESSION' if regressed else ''
+        print(f"{name:<45} {before:12.3f} {after:12.3f} {change:+8.1%}{flag}")
+        if regressed:
+            regressions.append(name)
+
+    if baseline.get('meta', {}).get('machine') != current.get('meta', {}).get('machine'):
+        print("\n⚠️ Baseline was recorded on a different machine type")
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1
+    print("\n✅ No regressions")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recommendation engine benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('--sizes', default=DEFAULT_SIZES,
+                            help='comma-separated catalog sizes, e.g. 10k,100k,1m')
+    run_parser.add_argument('--output', default='benchmark_results.json')
+    run_parser.add_argument('--queries', type=int, default=50, help='lookups per operation')
+    run_parser.add_argument('--top-k-queries', type=int, default=10,
+                            help='top-k searches per metric and item type')
+    run_parser.add_argument('--seed', type=int, default=SEED)
+    run_parser.add_argument('--data-dir', default=DATA_DIR)
+
+    compare_parser = commands.add_parser('compare', help='compare a run against a baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2,
+                                help='relative slowdown that counts as a regression')
+    compare_parser.add_argument('--min-ms', type=float, default=0.05,
+                                help='ignore slowdowns smaller than this many ms')
+
+    args = parser.parse_args(argv)
+    if args.command == 'run':
+        return run(args)
+    return compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+dataset_cache_module.py - Binary snapshot of a parsed dataset
+
+A snapshot stores the columnar arrays built by DataLoader next to the
+source CSV, keyed by a fingerprint of that CSV, so later starts can skip
+parsing entirely.
+"""
+
+import hashlib
+import os
+
+import numpy as np
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot.npz'
+
+# Separator used to join string tables; tables containing it fall back to offsets
+_SEPARATOR = '\x00'
+
+
+def snapshot_path(file_path):
+    """Get the snapshot path that belongs to a CSV file"""
+    return file_path + SNAPSHOT_SUFFIX
+
+
+def file_fingerprint(file_path, with_hash=True):
+    """Get size, mtime and (optionally) a content hash of a file"""
+    stat = os.stat(file_path)
+    fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'hash': ''}
+
+    if with_hash:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        fingerprint['hash'] = digest.hexdigest()
+
+    return fingerprint
+
+
+def fingerprint_matches(stored, file_path):
+    """Check a stored fingerprint against the current file
+
+    The size must match; an unchanged mtime is trusted, otherwise the
+    content hash decides.
+    """
+    current = file_fingerprint(file_path, with_hash=False)
+    if stored['size'] != current['size']:
+        return False
+    if stored['mtime_ns'] == current['mtime_ns']:
+        return True
+    return stored['hash'] == file_fingerprint(file_path)['hash']
+
+
+def pack_strings(strings):
+    """Encode a list of strings as one UTF-8 byte array plus byte offsets"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(_SEPARATOR.encode().join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def unpack_strings(blob, offsets):
+    """Decode a string table written by pack_strings"""
+    count = len(offsets) - 1
+    if count == 0:
+        return []
+
+    data = blob.tobytes()
+    strings = data.decode('utf-8').split(_SEPARATOR)
+    if len(strings) == count:
+        return strings
+
+    # Some string contains the separator itself: slice by offsets instead
+    # (offsets exclude separators, so shift each start by its index)
+    return [data[offsets[i] + i:offsets[i + 1] + i].decode('utf-8') for i in range(count)]
+
+
+def save_snapshot(path, fingerprint, arrays, strings):
+    """Write numeric arrays and string tables to a snapshot file atomically"""
+    payload = {
+        'version': np.array([SNAPSHOT_VERSION]),
+        'fp_size': np.array([fingerprint['size']]),
+        'fp_mtime_ns': np.array([fingerprint['mtime_ns']]),
+        'fp_hash': np.frombuffer(fingerprint['hash'].encode('ascii'), dtype=np.uint8)
+    }
+    payload.update(arrays)
+    for name, values in strings.items():
+        payload[f'str_{name}'], payload[f'off_{name}'] = pack_strings(values)
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **payload)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, file_path):
+    """Load a snapshot if it matches the current CSV, else return None
+
+    Returns (arrays, strings).
+    """
+    if not os.path.exists(path) or not os.path.exists(file_path):
+        return None
+
+    with np.load(path, allow_pickle=False) as data:
+        if int(data['version'][0]) != SNAPSHOT_VERSION:
+            return None
+
+        stored = {
+            'size': int(data['fp_size'][0]),
+            'mtime_ns': int(data['fp_mtime_ns'][0]),
+            'hash': data['fp_hash'].tobytes().decode('ascii')
+        }
+        if not fingerprint_matches(stored, file_path):
+            return None
+
+        arrays = {}
+        strings = {}
+        for name in data.files:
+            if name.startswith('str_'):
+                key = name[len('str_'):]
+                strings[key] = unpack_strings(data[name], data[f'off_{key}'])
+            elif not name.startswith(('off_', 'fp_')) and name != 'version':
+                arrays[name] = data[name]
+
+    return arrays, strings
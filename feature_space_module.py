@@ -0,0 +1,84 @@
+"""
+feature_space_module.py - Standardized, pre-normalized feature matrices
+
+Raw features mix scales: tempo (60-200) and loudness (-60-0) swamp the
+0-1 features. A FeatureSpace standardizes every column with the mean and
+standard deviation of the track catalog, then prepares rows per metric:
+
+    euclidean, manhattan   standardized rows
+    cosine                 standardized rows scaled to unit length
+    pearson                standardized rows, mean-centered, unit length
+
+With prepared rows, cosine and pearson are a single dot product per
+candidate. Queries go through the same transform. A row without a
+direction (all zero after centering, or with missing features) becomes
+NaN and is never recommended.
+"""
+
+import numpy as np
+
+FEATURE_SPACES = ['raw', 'scaled']
+
+# Metrics whose prepared rows reduce scoring to a dot product
+DOT_METRICS = ['cosine', 'pearson']
+
+# Rows transformed per block when preparing a whole matrix
+PREPARE_CHUNK = 65536
+
+
+def column_stats(matrix, chunk_size=PREPARE_CHUNK):
+    """Per-column mean and standard deviation, ignoring NaN, in two chunked passes
+
+    Columns without spread get a scale of 1 so they pass through unscaled.
+    """
+    width = matrix.shape[1]
+    counts = np.zeros(width)
+    sums = np.zeros(width)
+    for start in range(0, len(matrix), chunk_size):
+        block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+        finite = np.isfinite(block)
+        counts += finite.sum(axis=0)
+        sums += np.where(finite, block, 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(counts > 0, sums / counts, 0.0)
+
+    squares = np.zeros(width)
+    for start in range(0, len(matrix), chunk_size):
+        block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+        squares += np.where(np.isfinite(block), np.square(block - mean), 0).sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        std = np.sqrt(squares / counts)
+    scale = np.where(np.isfinite(std) & (std > 0), std, 1.0)
+    return mean, scale
+
+
+class FeatureSpace:
+    """Column standardization plus the per-metric row preparation"""
+
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+
+    @classmethod
+    def fit(cls, matrix, chunk_size=PREPARE_CHUNK):
+        """Standardize with the statistics of a (track) feature matrix"""
+        return cls(*column_stats(matrix, chunk_size))
+
+    def transform(self, values, metric):
+        """Prepare one vector or a block of rows for a metric"""
+        scaled = (np.asarray(values, dtype=np.float64) - self.mean) / self.scale
+        if metric not in DOT_METRICS:
+            return scaled
+        if metric == 'pearson':
+            scaled -= scaled.mean(axis=-1, keepdims=True)
+        norms = np.linalg.norm(scaled, axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(norms > 0, scaled / norms, np.nan)
+
+    def prepare(self, matrix, metric, chunk_size=PREPARE_CHUNK):
+        """Transform a whole matrix block by block into a new in-memory array"""
+        prepared = np.empty(matrix.shape, dtype=np.float64)
+        for start in range(0, len(matrix), chunk_size):
+            block = matrix[start:start + chunk_size]
+            prepared[start:start + len(block)] = self.transform(block, metric)
+        return prepared
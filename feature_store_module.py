@@ -0,0 +1,224 @@
+"""
+feature_store_module.py - Out-of-core, memory-mapped dataset backend
+
+A feature store is a directory next to the CSV. The feature matrix and
+the index arrays are raw binary files opened as read-only memory maps,
+and track IDs and names live in offset-indexed UTF-8 side files. Lookups
+by ID or name go through sorted 64-bit key hashes, so nothing that grows
+with the catalog has to stay resident.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+from collections.abc import Sequence
+
+import numpy as np
+
+from dataset_cache_module import fingerprint_matches
+
+STORE_VERSION = 1
+STORE_SUFFIX = '.store'
+META_FILE = 'meta.json'
+
+
+def store_path(file_path):
+    """Get the feature store directory that belongs to a CSV file"""
+    return file_path + STORE_SUFFIX
+
+
+def key_hash(key):
+    """Stable 64-bit hash of a string key"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def hash_keys(keys, transform=None):
+    """Hash a sequence of string keys into a uint64 array"""
+    if transform is not None:
+        keys = (transform(key) for key in keys)
+    return np.fromiter((key_hash(key) for key in keys), dtype=np.uint64)
+
+
+class StringTable(Sequence):
+    """Strings read on demand from an offset-indexed UTF-8 side file"""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        i = range(len(self))[index]
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+
+class HashIndex:
+    """Key -> rows lookup over sorted key hashes, verified against a StringTable"""
+
+    def __init__(self, hashes, rows, table, transform=None):
+        self.hashes = hashes
+        self.rows_by_hash = rows
+        self.table = table
+        self.transform = transform
+
+    def rows(self, key):
+        """Get all rows whose (transformed) string equals key, in row order"""
+        h = np.uint64(key_hash(key))
+        lo = np.searchsorted(self.hashes, h, side='left')
+        hi = np.searchsorted(self.hashes, h, side='right')
+        matches = []
+        for row in np.sort(self.rows_by_hash[lo:hi]).tolist():
+            value = self.table[row]
+            if self.transform is not None:
+                value = self.transform(value)
+            if value == key:
+                matches.append(row)
+        return matches
+
+    def get(self, key, default=None):
+        """Get the first row for key, like dict.get"""
+        rows = self.rows(key)
+        return rows[0] if rows else default
+
+
+class FeatureStoreWriter:
+    """Append track chunks to a new feature store, then finalize it
+
+    Files are written to a temporary directory which replaces the store
+    on finalize, so readers never see a half-written store.
+    """
+
+    def __init__(self, directory, n_features):
+        self.directory = directory
+        self.tmp_directory = f'{directory}.{os.getpid()}.tmp'
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+        os.makedirs(self.tmp_directory)
+
+        self.n_features = n_features
+        self.n_tracks = 0
+        self._files = {}
+        self._string_ends = {'ids': 0, 'names': 0}
+        for name in ('features', 'ids', 'ids_offsets', 'names', 'names_offsets',
+                     'id_hashes', 'name_hashes'):
+            self._files[name] = open(self._path(name), 'wb')
+        for name in ('ids_offsets', 'names_offsets'):
+            self._files[name].write(np.zeros(1, dtype=np.int64).tobytes())
+
+    def _path(self, name, directory=None):
+        return os.path.join(directory or self.tmp_directory, f'{name}.bin')
+
+    def _append_strings(self, name, strings):
+        encoded = [s.encode('utf-8') for s in strings]
+        ends = self._string_ends[name] + np.cumsum([len(b) for b in encoded], dtype=np.int64)
+        if len(ends):
+            self._string_ends[name] = int(ends[-1])
+        self._files[name].write(b''.join(encoded))
+        self._files[f'{name}_offsets'].write(ends.tobytes())
+
+    def append(self, track_ids, track_names, features):
+        """Append one chunk of tracks"""
+        track_ids = list(track_ids)
+        track_names = list(track_names)
+        self._files['features'].write(np.ascontiguousarray(features, dtype=np.float64).tobytes())
+        self._append_strings('ids', track_ids)
+        self._append_strings('names', track_names)
+        self._files['id_hashes'].write(hash_keys(track_ids).tobytes())
+        self._files['name_hashes'].write(hash_keys(track_names, str.lower).tobytes())
+        self.n_tracks += len(track_ids)
+
+    def finalize(self, artists, arrays, fingerprint):
+        """Write the artist tables and sorted hash indexes, then publish the store"""
+        for f in self._files.values():
+            f.close()
+
+        for name in ('id', 'name'):
+            hashes = np.fromfile(self._path(f'{name}_hashes'), dtype=np.uint64)
+            order = np.argsort(hashes, kind='stable')
+            hashes[order].tofile(self._path(f'{name}_hashes'))
+            order.astype(np.int64).tofile(self._path(f'{name}_hash_rows'))
+            del hashes, order
+
+        encoded = [artist.encode('utf-8') for artist in artists]
+        np.cumsum([0] + [len(b) for b in encoded], dtype=np.int64).tofile(self._path('artists_offsets'))
+        with open(self._path('artists'), 'wb') as f:
+            f.write(b''.join(encoded))
+
+        shapes = {}
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            array.tofile(self._path(name))
+            shapes[name] = [list(array.shape), array.dtype.str]
+
+        meta = {
+            'version': STORE_VERSION,
+            'n_tracks': self.n_tracks,
+            'n_features': self.n_features,
+            'arrays': shapes,
+            'fingerprint': fingerprint
+        }
+        with open(os.path.join(self.tmp_directory, META_FILE), 'w') as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.rename(self.tmp_directory, self.directory)
+
+    def abort(self):
+        """Discard a partially written store"""
+        for f in self._files.values():
+            f.close()
+        shutil.rmtree(self.tmp_directory, ignore_errors=True)
+
+
+class FeatureStore:
+    """Read-only, memory-mapped view of a finalized feature store"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_FILE)) as f:
+            self.meta = json.load(f)
+
+        n = self.meta['n_tracks']
+        self.features = self._map('features', np.float64, (n, self.meta['n_features']))
+        self.track_ids = StringTable(self._map('ids', np.uint8), self._map('ids_offsets', np.int64))
+        self.track_names = StringTable(self._map('names', np.uint8), self._map('names_offsets', np.int64))
+        self.id_index = HashIndex(self._map('id_hashes', np.uint64),
+                                  self._map('id_hash_rows', np.int64), self.track_ids)
+        self.name_index = HashIndex(self._map('name_hashes', np.uint64),
+                                    self._map('name_hash_rows', np.int64), self.track_names,
+                                    transform=str.lower)
+
+        # Artist names are kept in memory: there are far fewer artists than tracks
+        self.artists = list(StringTable(self._map('artists', np.uint8),
+                                        self._map('artists_offsets', np.int64)))
+        self.arrays = {
+            name: self._map(name, np.dtype(dtype), tuple(shape))
+            for name, (shape, dtype) in self.meta['arrays'].items()
+        }
+
+    def _map(self, name, dtype, shape=None):
+        path = os.path.join(self.directory, f'{name}.bin')
+        if os.path.getsize(path) == 0:
+            return np.zeros(shape or 0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=shape)
+
+    @classmethod
+    def open(cls, directory, file_path):
+        """Open a store if it exists and matches the current CSV, else return None"""
+        meta_path = os.path.join(directory, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            return None
+        if not fingerprint_matches(meta['fingerprint'], file_path):
+            return None
+
+        return cls(directory)
@@ -0,0 +1,166 @@
+"""
+hot_reload_module.py - Replace a served dataset without downtime
+
+A DatasetSnapshot pairs one fully loaded DataLoader with its
+SimilarityCalculator and is never changed after it is published. (This
+is unrelated to the binary snapshot cache in dataset_cache_module.)
+
+LiveDataset holds the current snapshot. When the CSV changes, a
+FileWatcher notices, a complete new snapshot is built on the watcher
+thread, and it is published with a single reference assignment. Readers
+take live.current once per request and use only that snapshot, so
+in-flight queries finish on the old data and later ones see the new
+data. Readers never see a half-loaded DataLoader, because nothing is
+reloaded in place.
+"""
+
+import threading
+import time
+
+from dataset_cache_module import file_fingerprint
+from instrumentation_module import registry
+from load_dataset_module import DataLoader
+from similarity_module import SimilarityCalculator
+
+
+def _file_stamp(file_path):
+    """(size, mtime) of a file, or None if it cannot be read right now"""
+    try:
+        fingerprint = file_fingerprint(file_path, with_hash=False)
+    except OSError:
+        return None
+    return fingerprint['size'], fingerprint['mtime_ns']
+
+
+class DatasetSnapshot:
+    """One loaded dataset and its calculator; read-only once published"""
+
+    __slots__ = ('loader', 'calculator', 'stamp', 'generation', 'loaded_at')
+
+    def __init__(self, loader, calculator, stamp, generation):
+        for name, value in (('loader', loader), ('calculator', calculator), ('stamp', stamp),
+                            ('generation', generation), ('loaded_at', time.time())):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('DatasetSnapshot is immutable')
+
+
+class FileWatcher:
+    """Poll a file and call on_change once a new version of it has settled
+
+    A change is reported only after the same new (size, mtime) has been
+    seen on two polls in a row, so a file that is still being copied in
+    is not loaded half-written.
+    """
+
+    def __init__(self, file_path, on_change, interval=2.0, baseline=None):
+        self.file_path = file_path
+        self.on_change = on_change
+        self.interval = interval
+        self.baseline = baseline
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.baseline is None:
+            self.baseline = _file_stamp(self.file_path)
+        self._thread = threading.Thread(target=self._run, name='file-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        pending = None
+        while not self._stop.wait(self.interval):
+            stamp = _file_stamp(self.file_path)
+            if stamp is None or stamp == self.baseline:
+                pending = None
+                continue
+            if stamp != pending:
+                pending = stamp
+                continue
+            self.baseline = stamp
+            pending = None
+            try:
+                self.on_change()
+            except Exception as e:
+                print(f"Error handling change of {self.file_path}: {e}")
+
+
+class LiveDataset:
+    """The current DatasetSnapshot of a CSV file, rebuilt when the file changes"""
+
+    def __init__(self, file_path, make_loader=None, make_calculator=None, on_swap=None):
+        self.file_path = file_path
+        self.make_loader = make_loader or DataLoader
+        self.make_calculator = make_calculator or SimilarityCalculator
+        # Called with the new snapshot after every swap
+        self.on_swap = on_swap
+        self.current = None
+        self.reloads = 0
+        self.failed_reloads = 0
+        self._reload_lock = threading.Lock()
+        self._retired = None
+        self._watcher = None
+
+    def load(self):
+        """Build a new snapshot of the file and publish it; returns True on success
+
+        Runs in the calling thread; readers keep using the previous
+        snapshot until the new one is complete.
+        """
+        with self._reload_lock:
+            # Stamped before loading: a change made during the load triggers another one
+            stamp = _file_stamp(self.file_path)
+            with registry.timer('dataset_reload'):
+                loader = self.make_loader(self.file_path)
+                loaded = loader.load_data()
+            if not loaded:
+                self.failed_reloads += 1
+                registry.count('dataset_reloads', outcome='failed')
+                if self.current is not None:
+                    print(f"Reload of {self.file_path} failed; still serving generation "
+                          f"{self.current.generation}")
+                return False
+
+            generation = self.current.generation + 1 if self.current is not None else 1
+            snapshot = DatasetSnapshot(loader, self.make_calculator(loader), stamp, generation)
+            previous, self.current = self.current, snapshot
+            self.reloads += 1
+            registry.count('dataset_reloads', outcome='ok')
+
+            # Queries still running on the snapshot before previous have had a whole
+            # reload to finish; release its worker processes now
+            if self._retired is not None:
+                self._retired.calculator.close()
+            self._retired = previous
+
+        print(f"Published dataset generation {generation} from {self.file_path}")
+        if self.on_swap is not None:
+            self.on_swap(snapshot)
+        return True
+
+    def reload_in_background(self):
+        """Start load() on a background thread and return the thread"""
+        thread = threading.Thread(target=self.load, name='dataset-reload', daemon=True)
+        thread.start()
+        return thread
+
+    def start_watching(self, interval=2.0):
+        """Reload whenever the file changes (polled every interval seconds)"""
+        baseline = self.current.stamp if self.current is not None else None
+        self._watcher = FileWatcher(self.file_path, self.load, interval, baseline)
+        self._watcher.start()
+
+    def stop(self):
+        """Stop watching and release every snapshot's worker processes"""
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        for snapshot in (self._retired, self.current):
+            if snapshot is not None:
+                snapshot.calculator.close()
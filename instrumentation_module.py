@@ -0,0 +1,180 @@
+"""
+instrumentation_module.py - Timers, counters and latency histograms
+
+One process-wide registry collects per-stage timings and call counts
+from DataLoader and SimilarityCalculator. It is off by default: every
+recording call then returns after a single flag check, and timer() hands
+back a shared no-op context. Turn it on with registry.enable() or by
+setting RECSYS_INSTRUMENTATION=1 before start-up.
+
+Each (name, labels) series keeps a count, a sum and the most recent
+samples, from which p50/p95/p99 are computed. Everything can be read as
+a dict, dumped as JSON or rendered in the Prometheus text format.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Recent samples kept per series for the percentiles
+SAMPLE_WINDOW = 2048
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+_NULL_TIMER = nullcontext()
+
+
+class _Timer:
+    """Context manager that records its elapsed time into a series"""
+
+    __slots__ = ('registry', 'name', 'labels', 'started')
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+class _Series:
+    """Count, sum and a window of recent samples"""
+
+    __slots__ = ('count', 'total', 'samples')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_WINDOW)
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantiles(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {q: 0.0 for q in QUANTILES}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in QUANTILES}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class Instrumentation:
+    """Registry of counters and timing series"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._series = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Forget everything recorded so far"""
+        with self._lock:
+            self._counters = {}
+            self._series = {}
+
+    def count(self, name, n=1, **labels):
+        """Add n to a counter"""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def observe(self, name, seconds, **labels):
+        """Record one duration in seconds"""
+        if not self.enabled:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series()
+            series.add(seconds)
+
+    def timer(self, name, **labels):
+        """Context manager timing its block into a series (a no-op when disabled)"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def snapshot(self):
+        """Get counters and timing summaries as plain data"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self._counters.items()]
+            timers = []
+            for (name, labels), series in self._series.items():
+                quantiles = series.quantiles()
+                timers.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': series.count,
+                    'sum': series.total,
+                    'p50': quantiles[0.5],
+                    'p95': quantiles[0.95],
+                    'p99': quantiles[0.99]
+                })
+        return {'enabled': self.enabled, 'counters': counters, 'timers': timers}
+
+    def timer_summary(self, name, **labels):
+        """Get the summary of one timing series, or None"""
+        for timer in self.snapshot()['timers']:
+            if timer['name'] == name and timer['labels'] == labels:
+                return timer
+        return None
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix='recsys_'):
+        """Render everything in the Prometheus text exposition format"""
+        def label_text(labels, extra=None):
+            items = list(labels.items()) + list((extra or {}).items())
+            if not items:
+                return ''
+            return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+        snapshot = self.snapshot()
+        lines = []
+        declared = set()
+        # Every line of one metric has to follow its TYPE line
+        for counter in sorted(snapshot['counters'], key=lambda c: c['name']):
+            name = f"{prefix}{counter['name']}_total"
+            if name not in declared:
+                lines.append(f'# TYPE {name} counter')
+                declared.add(name)
+            lines.append(f"{name}{label_text(counter['labels'])} {counter['value']}")
+        for timer in sorted(snapshot['timers'], key=lambda t: t['name']):
+            name = f"{prefix}{timer['name']}_seconds"
+            if name not in declared:
+                lines.append(f'# TYPE {name} summary')
+                declared.add(name)
+            for q in QUANTILES:
+                value = timer[f'p{int(q * 100)}']
+                lines.append(f"{name}{label_text(timer['labels'], {'quantile': q})} {value!r}")
+            lines.append(f"{name}_sum{label_text(timer['labels'])} {timer['sum']!r}")
+            lines.append(f"{name}_count{label_text(timer['labels'])} {timer['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+registry = Instrumentation(enabled=os.environ.get('RECSYS_INSTRUMENTATION', '') not in ('', '0'))
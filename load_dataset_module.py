@@ -2,19 +2,331 @@
 load_dataset_module.py - Complete working version
 """
 
-import pandas as pd
+# pandas is imported inside the parsing methods: restoring a snapshot never needs it
+import numpy as np
 import os
+import re
+import sys
+import threading
+from collections.abc import Mapping, Sequence
+from dataset_cache_module import file_fingerprint, load_snapshot, save_snapshot, snapshot_path
+from feature_store_module import FeatureStore, FeatureStoreWriter, store_path
+from instrumentation_module import registry
+
+STRING_COLUMNS = ['id', 'name', 'artists']
+
+REQUIRED_COLUMNS = ['acousticness', 'artists', 'danceability', 'energy', 'id',
+                    'liveness', 'loudness', 'name', 'popularity', 'speechiness',
+                    'tempo', 'valence']
+
+# DataLoader array attributes stored in the binary snapshot
+SNAPSHOT_ARRAYS = ['features', 'artist_offsets', 'artist_track_rows', 'name_offsets',
+                   'name_rows', 'track_artist_offsets', 'track_artist_codes',
+                   'artist_features', 'artist_track_counts', 'artist_norms']
+
+# DataLoader array attributes stored in the memory-mapped feature store
+STORE_ARRAYS = ['artist_offsets', 'artist_track_rows', 'track_artist_offsets',
+                'track_artist_codes', 'artist_features', 'artist_track_counts', 'artist_norms']
+
+# Distinct artists strings remembered while streaming before the memo is reset
+STREAM_CODES_CACHE_SIZE = 100000
+
+# Distinct raw artists strings whose parsed lists are memoized before the memo is reset
+ARTISTS_MEMO_SIZE = 100000
+
+# One plain quoted item of an artists list and the comma (or end) after it
+_ARTIST_ITEM = re.compile(r"""[ \t]*(?:'([^'\\\r\n\x00]*)'|"([^"\\\r\n\x00]*)")[ \t]*(?:,|\Z)""")
+
+# Fixed column order of the feature matrix (matches SimilarityCalculator)
+FEATURE_COLUMNS = ['acousticness', 'danceability', 'energy', 'liveness',
+                   'loudness', 'popularity', 'speechiness', 'tempo', 'valence']
+
+# dtypes the feature matrices can be held in (see DataLoader precision)
+STORAGE_PRECISIONS = ['float64', 'float32']
+
+# Keys of a track record, and the feature matrix column of each feature key
+TRACK_KEYS = ['id', 'name'] + FEATURE_COLUMNS
+FEATURE_INDEX = {column: j for j, column in enumerate(FEATURE_COLUMNS)}
+
+
+def _is_required_column(column):
+    return column in REQUIRED_COLUMNS
+
+
+def _expand_pairs(codes, counts, flat_values):
+    """Expand per-row codes of distinct values into (row, value) pairs
+
+    Distinct value u owns flat_values[starts[u]:starts[u] + counts[u]].
+    """
+    starts = np.cumsum(counts) - counts
+    row_counts = counts[codes]
+    pair_rows = np.repeat(np.arange(len(codes)), row_counts)
+    pair_offsets = np.arange(len(pair_rows)) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    return pair_rows, flat_values[np.repeat(starts[codes], row_counts) + pair_offsets]
+
+
+def _share_strings(strings):
+    """Object array in which equal strings are one shared object"""
+    table = {}
+    return np.array([table.setdefault(string, string) for string in strings], dtype=object)
+
+
+def _intern_all(strings):
+    return [sys.intern(string) for string in strings]
+
+
+def _split_artist_list(text):
+    """Items of a ['a', "b"] list, or None when text needs the full literal parser
+
+    Handles only quoted items without escapes, which is what the CSV
+    dumps contain; anything else gets None.
+    """
+    inner = text[1:-1]
+    if not inner.strip(' \t'):
+        return []
+    items = []
+    pos = 0
+    while pos < len(inner):
+        match = _ARTIST_ITEM.match(inner, pos)
+        if match is None:
+            return None
+        single, double = match.groups()
+        items.append(single if single is not None else double)
+        pos = match.end()
+    return items
+
+
+def _parse_artists_string(artists_str):
+    """Parse an artists string into a list of artist names"""
+    if not artists_str:
+        return ['Unknown Artist']
+    
+    artists_str = artists_str.strip()
+    
+    # Try to parse as list
+    if artists_str.startswith('[') and artists_str.endswith(']'):
+        artists_list = _split_artist_list(artists_str)
+        if artists_list is not None:
+            return [a.strip() for a in artists_list]
+        try:
+            # Escapes, adjacent literals, non-string items...
+            import ast
+            artists_list = ast.literal_eval(artists_str)
+            if isinstance(artists_list, list):
+                return [str(a).strip() for a in artists_list]
+        except Exception:
+            pass
+    
+    # Try comma or semicolon separated
+    if ';' in artists_str:
+        return [a.strip() for a in artists_str.split(';')]
+    elif ',' in artists_str:
+        return [a.strip() for a in artists_str.split(',')]
+    
+    # Single artist
+    return [artists_str]
+
+
+def _group_rows(codes, n_groups):
+    """Group positions by code, keeping original order within each group (CSR form)"""
+    order = np.argsort(codes, kind='stable')
+    offsets = np.zeros(n_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=n_groups), out=offsets[1:])
+    return offsets, order
+
+
+class _GrowingArray:
+    """Append-only NumPy buffer that grows its capacity geometrically"""
+
+    def __init__(self, dtype, width=None):
+        self.width = width
+        self.size = 0
+        self._data = np.zeros(self._shape(1024), dtype=dtype)
+
+    def _shape(self, rows):
+        return (rows,) if self.width is None else (rows, self.width)
+
+    def _reserve(self, rows):
+        if rows > len(self._data):
+            grown = np.zeros(self._shape(max(rows, len(self._data) * 3 // 2)), dtype=self._data.dtype)
+            grown[:self.size] = self._data[:self.size]
+            self._data = grown
+
+    def append(self, values):
+        """Append a block of rows"""
+        self._reserve(self.size + len(values))
+        self._data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def extend_to(self, rows):
+        """Grow to at least rows entries, zero-filled"""
+        self._reserve(rows)
+        # Capacity left by truncate may still hold old values
+        self._data[self.size:rows] = 0
+        self.size = max(self.size, rows)
+    
+    def truncate(self, rows):
+        """Drop every entry from rows on, keeping the capacity"""
+        self.size = min(self.size, rows)
+
+    @property
+    def view(self):
+        return self._data[:self.size]
+
+    def finish(self):
+        """Trim spare capacity and return the array"""
+        self._data.resize(self._shape(self.size), refcheck=False)
+        return self._data
+
+
+class TrackRecord(Mapping):
+    """One track as a read-only mapping over a shared track table
+
+    Holds only the table (anything with track_ids, track_names and
+    features) and a row, instead of an eleven-key dict per track.
+    record['energy'] and dict(record) work as with the old dicts.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __getitem__(self, key):
+        if key == 'id':
+            return self.table.track_ids[self.row]
+        if key == 'name':
+            return self.table.track_names[self.row]
+        return float(self.table.features[self.row, FEATURE_INDEX[key]])
+
+    def __iter__(self):
+        return iter(TRACK_KEYS)
+
+    def __len__(self):
+        return len(TRACK_KEYS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TrackView(Sequence):
+    """Read-only list of track records built on demand from the feature matrix"""
+
+    def __init__(self, track_ids, track_names, features):
+        self.track_ids = track_ids
+        self.track_names = track_names
+        self.features = features
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return TrackRecord(self, range(len(self))[index])
+
+
+class ArtistMusicView(Mapping):
+    """Read-only artist -> tracks mapping built on demand from the CSR arrays"""
+
+    def __init__(self, artist_to_row, artist_offsets, artist_track_rows, tracks):
+        self.artist_to_row = artist_to_row
+        self.artist_offsets = artist_offsets
+        self.artist_track_rows = artist_track_rows
+        self.tracks = tracks
+
+    def __len__(self):
+        return len(self.artist_to_row)
+
+    def __iter__(self):
+        return iter(self.artist_to_row)
+
+    def __getitem__(self, artist):
+        a = self.artist_to_row[artist]
+        rows = self.artist_track_rows[self.artist_offsets[a]:self.artist_offsets[a + 1]]
+        return [self.tracks[row] for row in rows.tolist()]
+
 
 class DataLoader:
-    def __init__(self, file_path='data.csv'):
+    def __init__(self, file_path='data.csv', use_snapshot=True, backend='memory', store_dir=None,
+                 chunk_size=None, progress_callback=None, precision='float64'):
         self.file_path = file_path
+        self.use_snapshot = use_snapshot
+        # Streaming mode: parse chunk_size rows at a time and call
+        # progress_callback(rows_loaded, fraction_of_file_read) after each chunk
+        self.chunk_size = chunk_size
+        self.progress_callback = progress_callback
+        # 'memory' keeps everything in RAM, 'memmap' serves from an on-disk feature store
+        self.backend = backend
+        self.store_dir = store_dir or store_path(file_path)
+        self.feature_store = None
+        # 'float32' halves the resident feature matrices; snapshots keep float64
+        if precision not in STORAGE_PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        if precision != 'float64' and backend == 'memmap':
+            raise ValueError("The memmap backend stores float64 features")
+        self.precision = precision
+        # Bumped on every successful load so dependants can drop derived state
+        self.version = 0
         self.artist_music = {}
         self.tracks = []
         self.artists = []
         self.loaded = False
+        # Serializes loads and updates; readers only take it while nothing is loaded yet
+        self._load_lock = threading.RLock()
+        self._artists_memo = {}
+        
+        # Columnar copy of self.tracks: row i describes self.tracks[i]
+        self.features = np.empty((0, len(FEATURE_COLUMNS)))
+        self.track_ids = np.empty(0, dtype=object)
+        self.track_names = np.empty(0, dtype=object)
+        self.id_to_row = {}
+        self.duplicate_id_rows = {}
+        
+        # Artist -> track rows in CSR form: rows of artist a are
+        # artist_track_rows[artist_offsets[a]:artist_offsets[a + 1]]
+        self.artist_offsets = np.zeros(1, dtype=np.int64)
+        self.artist_track_rows = np.empty(0, dtype=np.int64)
+        
+        # Lookup indexes, same CSR layout: lowercase track name -> rows
+        # and track row -> artist positions in self.artists
+        self.name_to_code = {}
+        self.name_offsets = np.zeros(1, dtype=np.int64)
+        self.name_rows = np.empty(0, dtype=np.int64)
+        self.track_artist_offsets = np.zeros(1, dtype=np.int64)
+        self.track_artist_codes = np.empty(0, dtype=np.int64)
+        
+        # Per-artist centroids, row a describes self.artists[a]
+        self.artist_to_row = {}
+        self.artist_features = np.empty((0, len(FEATURE_COLUMNS)))
+        self.artist_track_counts = np.empty(0, dtype=np.int64)
+        self.artist_norms = np.empty(0)
+        
+        # Set up by the first incremental update, see _make_mutable
+        self._buffers = None
+        self._name_tracks = None
+        self._track_table = None
     
     def load_data(self):
-        """Load and parse the dataset"""
+        """Load and parse the dataset
+
+        Loads in place: threads reading this loader while it reloads can
+        see a mix of old and new data. Use hot_reload_module.LiveDataset
+        to replace a dataset that is being served.
+        """
+        with self._load_lock, registry.timer('load_data', backend=self.backend):
+            return self._load_data()
+    
+    def _ensure_loaded(self):
+        """Load on first use; concurrent first callers wait for one load"""
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load_data()
+    
+    def _load_data(self):
+        """Body of load_data, timed stage by stage"""
         try:
             print(f"Loading data from {self.file_path}")
             
@@ -22,69 +334,70 @@ class DataLoader:
                 print(f"File not found: {self.file_path}")
                 return None
             
-            # Try to read the CSV
-            try:
-                df = pd.read_csv(self.file_path)
-            except Exception as e:
-                print(f"Error reading CSV: {e}")
-                return None
+            with registry.timer('load_stage', stage='restore'):
+                if self.backend == 'memmap':
+                    restored = self._open_feature_store()
+                else:
+                    restored = self.use_snapshot and self._load_snapshot()
             
-            if df.empty:
-                print("CSV file is empty")
-                return None
-            
-            print(f"Found {len(df)} rows, {len(df.columns)} columns")
-            
-            # Check for required columns
-            required = ['acousticness', 'artists', 'danceability', 'energy', 'id',
-                       'liveness', 'loudness', 'name', 'popularity', 'speechiness',
-                       'tempo', 'valence']
+            if restored:
+                self._apply_precision()
+                self._drop_update_state()
+                self.loaded = True
+                self.version += 1
+                print(f"Successfully loaded {len(self.artist_music)} artists and {len(self.tracks)} tracks")
+                return self.artist_music
             
-            # Create artist_music dictionary
-            self.artist_music = {}
-            self.tracks = []
-            self.artists = []
+            # Fingerprint before parsing so a concurrent edit invalidates the cache
+            with registry.timer('load_stage', stage='fingerprint'):
+                fingerprint = file_fingerprint(self.file_path)
             
-            for index, row in df.iterrows():
+            if self.chunk_size:
+                with registry.timer('load_stage', stage='parse_streaming'):
+                    loaded = self._load_streaming(fingerprint)
+                if not loaded:
+                    return None
+            else:
+                # Try to read the CSV
                 try:
-                    # Get track info
-                    track_id = str(row.get('id', f'track_{index}'))
-                    track_name = str(row.get('name', f'Track {index}'))
-                    
-                    # Create track dictionary
-                    track = {
-                        'id': track_id,
-                        'name': track_name,
-                        'acousticness': float(row.get('acousticness', 0)),
-                        'danceability': float(row.get('danceability', 0)),
-                        'energy': float(row.get('energy', 0)),
-                        'liveness': float(row.get('liveness', 0)),
-                        'loudness': float(row.get('loudness', 0)),
-                        'popularity': float(row.get('popularity', 0)),
-                        'speechiness': float(row.get('speechiness', 0)),
-                        'tempo': float(row.get('tempo', 0)),
-                        'valence': float(row.get('valence', 0))
-                    }
-                    
-                    self.tracks.append(track)
-                    
-                    # Parse artists
-                    artists_str = str(row.get('artists', 'Unknown'))
-                    artists_list = self._parse_artists(artists_str)
-                    
-                    # Add to artist_music dictionary
-                    for artist in artists_list:
-                        if artist not in self.artist_music:
-                            self.artist_music[artist] = []
-                            self.artists.append(artist)
-                        
-                        self.artist_music[artist].append(track)
-                        
+                    with registry.timer('load_stage', stage='parse'):
+                        df = self._read_csv()
                 except Exception as e:
-                    print(f"Warning: Error processing row {index}: {e}")
-                    continue
+                    print(f"Error reading CSV: {e}")
+                    return None
+                
+                if len(df) == 0:
+                    print("CSV file is empty")
+                    return None
+                
+                print(f"Found {len(df)} rows, {len(df.columns)} columns")
+                
+                with registry.timer('load_stage', stage='coerce'):
+                    track_ids, track_names, features, artist_strings = self._coerce_columns(df)
+                del df
+                
+                with registry.timer('load_stage', stage='build'):
+                    self._build_dataset(track_ids, track_names, features, artist_strings)
+                if self.backend == 'memmap':
+                    with registry.timer('load_stage', stage='store_write'):
+                        self._write_feature_store(fingerprint)
+            
+            if self.backend == 'memmap':
+                with registry.timer('load_stage', stage='store_open'):
+                    opened = self._open_feature_store()
+                if not opened:
+                    return None
+            else:
+                with registry.timer('load_stage', stage='track_objects'):
+                    self._build_track_objects()
+                if self.use_snapshot:
+                    with registry.timer('load_stage', stage='snapshot_save'):
+                        self._save_snapshot(fingerprint)
             
+            self._apply_precision()
+            self._drop_update_state()
             self.loaded = True
+            self.version += 1
             print(f"Successfully loaded {len(self.artist_music)} artists and {len(self.tracks)} tracks")
             return self.artist_music
             
@@ -92,88 +405,796 @@ class DataLoader:
             print(f"Unexpected error: {e}")
             return None
     
-    def _parse_artists(self, artists_str):
-        """Parse artists string into list"""
-        if pd.isna(artists_str) or not artists_str:
-            return ['Unknown Artist']
+    def _read_csv(self, path=None, extra_columns=()):
+        """Read only the required columns (plus extra_columns), with explicit dtypes"""
+        import pandas as pd
+        path = path or self.file_path
+        usecols = _is_required_column
+        if extra_columns:
+            usecols = lambda column: _is_required_column(column) or column in extra_columns
+        dtypes = self._string_dtypes(extra_columns)
+        dtypes.update({column: np.float64 for column in FEATURE_COLUMNS})
+        
+        try:
+            return pd.read_csv(path, usecols=usecols, dtype=dtypes)
+        except ValueError:
+            # Some feature cell is not numeric; parse features leniently instead
+            return pd.read_csv(path, usecols=usecols, dtype=self._string_dtypes(extra_columns))
+    
+    def _string_dtypes(self, extra_columns=()):
+        """Column dtypes for lenient parsing: only the string columns are fixed"""
+        return {column: str for column in [*STRING_COLUMNS, *extra_columns]}
+    
+    def _coerce_columns(self, df):
+        """Convert a DataFrame into id/name/artist string arrays and a feature matrix"""
+        import pandas as pd
+        n = len(df)
+        features = np.zeros((n, len(FEATURE_COLUMNS)), dtype=np.float64)
+        valid = np.ones(n, dtype=bool)
+        
+        for j, column in enumerate(FEATURE_COLUMNS):
+            if column not in df:
+                continue
+            values = pd.to_numeric(df[column], errors='coerce')
+            # A cell that was present but did not parse invalidates its row
+            valid &= ~(values.isna() & df[column].notna()).to_numpy()
+            features[:, j] = values.to_numpy(dtype=np.float64)
+        
+        if not valid.all():
+            print(f"Warning: Skipping {n - int(valid.sum())} rows with non-numeric features")
+            df = df[valid]
+            features = features[valid]
+        
+        track_ids = self._string_column(df, 'id', 'track_')
+        track_names = self._string_column(df, 'name', 'Track ')
+        if 'artists' in df:
+            artist_strings = df['artists'].fillna('nan').to_numpy(dtype=object)
+        else:
+            artist_strings = np.full(len(df), 'Unknown', dtype=object)
+        
+        return track_ids, track_names, features, artist_strings
+    
+    def _string_column(self, df, column, default_prefix):
+        """Get a string column as an object array, defaulting to prefix + row label"""
+        if column in df:
+            return df[column].fillna('nan').to_numpy(dtype=object)
+        return np.array([f'{default_prefix}{index}' for index in df.index], dtype=object)
+    
+    def _build_dataset(self, track_ids, track_names, features, artist_strings):
+        """Build the artist mapping, indexes and columnar arrays in bulk"""
+        import pandas as pd
+        self.features = features
+        self.track_ids = track_ids
+        self.track_names = _share_strings(track_names)
+        
+        # Parse each distinct artists string once, then expand to (row, artist) pairs
+        codes, uniques = pd.factorize(artist_strings)
+        parsed = [self._parse_artists(artists_str) for artists_str in uniques]
+        counts = np.array([len(artists_list) for artists_list in parsed], dtype=np.int64)
+        flat_artists = np.array([artist for artists_list in parsed for artist in artists_list],
+                                dtype=object)
+        pair_rows, pair_artists = _expand_pairs(codes, counts, flat_artists)
+        
+        # Group rows by artist in order of first appearance
+        artist_codes, artist_names = pd.factorize(pair_artists)
+        self.artists = _intern_all(artist_names)
+        
+        self._group_artists(pair_rows, artist_codes)
+        self._build_track_artists(pair_rows, artist_codes)
+        self._build_artist_centroids()
+        self._build_lookups(self._build_name_index())
+    
+    def _load_streaming(self, fingerprint):
+        """Parse the CSV chunk by chunk into growing typed arrays
+
+        Each chunk is coerced, appended and released before the next one
+        is read. With the memmap backend the tracks go straight into the
+        feature store writer instead of memory. Returns True on success.
+        """
+        import pandas as pd
+        writer = None
+        if self.backend == 'memmap':
+            writer = FeatureStoreWriter(self.store_dir, len(FEATURE_COLUMNS))
+        
+        features = _GrowingArray(np.float64, len(FEATURE_COLUMNS))
+        track_ids = _GrowingArray(object)
+        track_names = _GrowingArray(object)
+        pair_rows = _GrowingArray(np.int64)
+        pair_codes = _GrowingArray(np.int64)
+        artist_sums = _GrowingArray(np.float64, len(FEATURE_COLUMNS))
+        
+        self.artists = []
+        artist_to_code = {}
+        codes_cache = {}
+        n = 0
+        total_bytes = max(os.path.getsize(self.file_path), 1)
+        
+        try:
+            with open(self.file_path, 'rb') as f:
+                reader = pd.read_csv(f, usecols=_is_required_column, dtype=self._string_dtypes(),
+                                     chunksize=self.chunk_size)
+                for chunk in reader:
+                    chunk_ids, chunk_names, chunk_features, artist_strings = self._coerce_columns(chunk)
+                    del chunk
+                    
+                    # Artist codes per distinct artists string, assigned in order of first appearance
+                    codes, uniques = pd.factorize(artist_strings)
+                    unique_codes = [self._artist_codes(s, artist_to_code, codes_cache) for s in uniques]
+                    counts = np.array([len(c) for c in unique_codes], dtype=np.int64)
+                    flat_codes = np.concatenate(unique_codes + [np.empty(0, dtype=np.int64)])
+                    local_rows, chunk_codes = _expand_pairs(codes, counts, flat_codes)
+                    
+                    artist_sums.extend_to(len(self.artists))
+                    np.add.at(artist_sums.view, chunk_codes, chunk_features[local_rows])
+                    pair_rows.append(local_rows + n)
+                    pair_codes.append(chunk_codes)
+                    
+                    if writer is not None:
+                        writer.append(chunk_ids, chunk_names, chunk_features)
+                    else:
+                        features.append(chunk_features)
+                        track_ids.append(chunk_ids)
+                        track_names.append(chunk_names)
+                    n += len(chunk_ids)
+                    
+                    if self.progress_callback:
+                        self.progress_callback(n, min(f.tell() / total_bytes, 1.0))
+        except Exception as e:
+            print(f"Error reading CSV: {e}")
+            if writer is not None:
+                writer.abort()
+            return False
+        
+        if n == 0:
+            print("CSV file is empty")
+            if writer is not None:
+                writer.abort()
+            return False
+        
+        print(f"Streamed {n} rows in chunks of {self.chunk_size}")
+        
+        pair_rows = pair_rows.finish()
+        pair_codes = pair_codes.finish()
+        self._group_artists(pair_rows, pair_codes)
+        self._build_track_artists(pair_rows, pair_codes, n)
+        del pair_rows, pair_codes
+        self._build_artist_centroids(artist_sums.finish())
+        
+        if writer is not None:
+            writer.finalize(self.artists, {name: getattr(self, name) for name in STORE_ARRAYS},
+                            fingerprint)
+            return True
+        
+        self.features = features.finish()
+        self.track_ids = track_ids.finish()
+        self.track_names = _share_strings(track_names.finish())
+        self._build_lookups(self._build_name_index())
+        return True
+    
+    def _artist_codes(self, artists_str, artist_to_code, codes_cache):
+        """Parse an artists string into artist codes, registering new artists"""
+        codes = codes_cache.get(artists_str)
+        if codes is None:
+            codes = []
+            for artist in self._parse_artists(artists_str):
+                code = artist_to_code.get(artist)
+                if code is None:
+                    code = artist_to_code[artist] = len(self.artists)
+                    self.artists.append(sys.intern(artist))
+                codes.append(code)
+            codes = np.array(codes, dtype=np.int64)
+            if len(codes_cache) >= STREAM_CODES_CACHE_SIZE:
+                codes_cache.clear()
+            codes_cache[artists_str] = codes
+        return codes
+    
+    def _group_artists(self, pair_rows, artist_codes):
+        """Build the artist -> track rows CSR arrays from (row, artist) pairs"""
+        self.artist_offsets, order = _group_rows(artist_codes, len(self.artists))
+        self.artist_track_rows = pair_rows[order]
+    
+    def _build_lookups(self, name_keys):
+        """Build the hash maps over the ID, name and artist string tables"""
+        n = len(self.track_ids)
+        # Reversed so that the first occurrence of a duplicate ID wins
+        self.id_to_row = dict(zip(self.track_ids[::-1].tolist(), range(n - 1, -1, -1)))
+        # Every row of the (rare) IDs that occur more than once
+        self.duplicate_id_rows = {}
+        if len(self.id_to_row) < n:
+            import pandas as pd
+            duplicated = pd.Series(self.track_ids, dtype=object).duplicated(keep=False).to_numpy()
+            for row in np.flatnonzero(duplicated).tolist():
+                self.duplicate_id_rows.setdefault(self.track_ids[row], []).append(row)
+        self.name_to_code = dict(zip(name_keys, range(len(name_keys))))
+        self.artist_to_row = dict(zip(self.artists, range(len(self.artists))))
+    
+    def _build_track_objects(self):
+        """Materialize self.tracks and self.artist_music from the arrays"""
+        # Records share one table and are shared by the artist_music lists
+        table = TrackView(self.track_ids, self.track_names, self.features)
+        self.tracks = [TrackRecord(table, row) for row in range(len(table))]
+        
+        self._track_table = table
+        
+        self.artist_music = {}
+        tracks = self.tracks
+        rows = self.artist_track_rows.tolist()
+        offsets = self.artist_offsets.tolist()
+        for a, artist in enumerate(self.artists):
+            self.artist_music[artist] = [tracks[row] for row in rows[offsets[a]:offsets[a + 1]]]
+    
+    def _build_name_index(self):
+        """Build the lowercase name -> rows table
+
+        Returns the distinct lowercase names, in name code order.
+        """
+        import pandas as pd
+        lowered = pd.Series(self.track_names, dtype=object).str.lower().to_numpy(dtype=object)
+        name_codes, names = pd.factorize(lowered)
+        self.name_offsets, self.name_rows = _group_rows(name_codes, len(names))
+        return names.tolist()
+    
+    def _build_track_artists(self, pair_rows, artist_codes, n=None):
+        """Build the track -> artists table, in artist_music order and without repeats"""
+        n = len(self.track_ids) if n is None else n
+        order = np.lexsort((artist_codes, pair_rows))
+        rows = pair_rows[order]
+        codes = artist_codes[order]
+        keep = np.ones(len(rows), dtype=bool)
+        keep[1:] = (rows[1:] != rows[:-1]) | (codes[1:] != codes[:-1])
+        self.track_artist_codes = codes[keep]
+        self.track_artist_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows[keep], minlength=n), out=self.track_artist_offsets[1:])
+    
+    def _build_artist_centroids(self, sums=None):
+        """Average the features of every artist's tracks in one pass
+
+        sums optionally holds per-artist feature sums accumulated elsewhere.
+        """
+        self.artist_track_counts = np.diff(self.artist_offsets)
+        
+        if sums is None:
+            if len(self.artist_track_rows):
+                sums = np.add.reduceat(self.features[self.artist_track_rows],
+                                       self.artist_offsets[:-1], axis=0)
+            else:
+                sums = np.zeros((len(self.artists), len(FEATURE_COLUMNS)))
+        
+        self.artist_features = sums / self.artist_track_counts[:, None]
+        self.artist_norms = np.linalg.norm(self.artist_features, axis=1)
+    
+    def _save_snapshot(self, fingerprint):
+        """Write the parsed arrays to a binary snapshot next to the CSV"""
+        path = snapshot_path(self.file_path)
+        arrays = {name: getattr(self, name) for name in SNAPSHOT_ARRAYS}
+        strings = {
+            'track_ids': self.track_ids.tolist(),
+            'track_names': self.track_names.tolist(),
+            'artists': self.artists,
+            'name_keys': list(self.name_to_code)
+        }
+        try:
+            save_snapshot(path, fingerprint, arrays, strings)
+        except Exception as e:
+            print(f"Warning: Could not write snapshot {path}: {e}")
+    
+    def _load_snapshot(self):
+        """Restore the dataset from a valid snapshot; returns True on success"""
+        path = snapshot_path(self.file_path)
+        try:
+            snapshot = load_snapshot(path, self.file_path)
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable snapshot {path}: {e}")
+            return False
+        
+        if snapshot is None:
+            return False
+        
+        arrays, strings = snapshot
+        for name in SNAPSHOT_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.track_ids = np.array(strings['track_ids'], dtype=object)
+        self.track_names = _share_strings(strings['track_names'])
+        self.artists = _intern_all(strings['artists'])
+        self._build_lookups(strings['name_keys'])
+        
+        # Track records are built on access instead of up front
+        self.tracks = TrackView(self.track_ids, self.track_names, self.features)
+        self.artist_music = ArtistMusicView(self.artist_to_row, self.artist_offsets,
+                                            self.artist_track_rows, self.tracks)
+        print(f"Loaded snapshot {path}")
+        return True
+    
+    def _write_feature_store(self, fingerprint):
+        """Write the parsed arrays to the memory-mapped feature store"""
+        writer = FeatureStoreWriter(self.store_dir, len(FEATURE_COLUMNS))
+        try:
+            writer.append(self.track_ids, self.track_names, self.features)
+            writer.finalize(self.artists, {name: getattr(self, name) for name in STORE_ARRAYS},
+                            fingerprint)
+        except Exception:
+            writer.abort()
+            raise
+    
+    def _open_feature_store(self):
+        """Serve the dataset from a valid feature store; returns True on success"""
+        try:
+            store = FeatureStore.open(self.store_dir, self.file_path)
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable feature store {self.store_dir}: {e}")
+            return False
+        
+        if store is None:
+            return False
+        
+        self.feature_store = store
+        self.features = store.features
+        self.track_ids = store.track_ids
+        self.track_names = store.track_names
+        self.id_to_row = store.id_index
+        self.artists = _intern_all(store.artists)
+        self.artist_to_row = dict(zip(self.artists, range(len(self.artists))))
+        for name in STORE_ARRAYS:
+            setattr(self, name, store.arrays[name])
         
-        artists_str = str(artists_str).strip()
+        # The name index lives in the store; drop the in-memory one
+        self.name_to_code = {}
+        self.name_offsets = np.zeros(1, dtype=np.int64)
+        self.name_rows = np.empty(0, dtype=np.int64)
         
-        # Try to parse as list
-        if artists_str.startswith('[') and artists_str.endswith(']'):
+        self.tracks = TrackView(self.track_ids, self.track_names, self.features)
+        self.artist_music = ArtistMusicView(self.artist_to_row, self.artist_offsets,
+                                            self.artist_track_rows, self.tracks)
+        print(f"Opened feature store {self.store_dir}")
+        return True
+    
+    def add_tracks(self, tracks):
+        """Add tracks given as mappings with id, name, artists and feature keys
+
+        artists may be a string in any format the CSV accepts, or a list.
+        Missing features are 0 and rows with non-numeric features are
+        skipped, as when loading. Returns the number of tracks added, or
+        None if the catalog cannot be updated.
+        """
+        with self._load_lock:
+            import pandas as pd
+            if not self._can_update():
+                return None
+            
+            records = []
+            for track in tracks:
+                track = dict(track)
+                if isinstance(track.get('artists'), (list, tuple)):
+                    track['artists'] = str(list(track['artists']))
+                records.append(track)
+            if not records:
+                return 0
+            
+            df = pd.DataFrame.from_records(records)
+            if 'id' not in df:
+                print("Error: New tracks need an 'id'")
+                return None
+            added = self._add_rows(*self._coerce_columns(df))
+            self.version += 1
+            return added
+    
+    def remove_tracks(self, track_ids):
+        """Remove every track with one of the given IDs; returns the number removed
+
+        The last row moves into each freed row, so rows keep no gaps but
+        may change order. Returns None if the catalog cannot be updated.
+        """
+        with self._load_lock:
+            if not self._can_update():
+                return None
+            
+            rows = set()
+            for track_id in track_ids:
+                duplicates = self.duplicate_id_rows.get(track_id)
+                if duplicates:
+                    rows.update(duplicates)
+                elif track_id in self.id_to_row:
+                    rows.add(self.id_to_row[track_id])
+            if not rows:
+                return 0
+            
+            self._remove_rows(sorted(rows, reverse=True))
+            self.version += 1
+            return len(rows)
+    
+    def apply_delta(self, delta_path):
+        """Apply a delta CSV: dataset columns plus an optional op column
+
+        Rows with op 'remove' delete the tracks with that id, every other
+        row is added. Removals are applied first, so a remove and an add
+        of the same id replace a track. Returns (added, removed), or None
+        on failure.
+        """
+        with self._load_lock:
+            if not self._can_update():
+                return None
+            
             try:
-                import ast
-                artists_list = ast.literal_eval(artists_str)
-                if isinstance(artists_list, list):
-                    return [str(a).strip() for a in artists_list]
-            except:
-                pass
-        
-        # Try comma or semicolon separated
-        if ';' in artists_str:
-            return [a.strip() for a in artists_str.split(';')]
-        elif ',' in artists_str:
-            return [a.strip() for a in artists_str.split(',')]
-        
-        # Single artist
-        return [artists_str]
+                df = self._read_csv(delta_path, extra_columns=('op',))
+            except Exception as e:
+                print(f"Error reading delta CSV: {e}")
+                return None
+            if 'id' not in df:
+                print(f"Error: Delta CSV {delta_path} has no id column")
+                return None
+            
+            if 'op' in df:
+                ops = df['op'].fillna('add').str.strip().str.lower()
+                removing = (ops == 'remove').to_numpy()
+            else:
+                removing = np.zeros(len(df), dtype=bool)
+            
+            removed = self.remove_tracks(df['id'][removing].dropna().tolist()) if removing.any() else 0
+            adds = df[~removing]
+            added = 0
+            if len(adds):
+                added = self._add_rows(*self._coerce_columns(adds))
+                self.version += 1
+            print(f"Applied {delta_path}: {added} tracks added, {removed} removed")
+            return added, removed
+    
+    def _can_update(self):
+        self._ensure_loaded()
+        if not self.loaded:
+            return False
+        if self.feature_store is not None:
+            print("Error: Incremental updates need the memory backend")
+            return False
+        self._make_mutable()
+        return True
+    
+    def _make_mutable(self):
+        """Move the catalog into structures that updates can change in place
+
+        Runs once per load and costs one pass over the catalog; every
+        update after that only touches the rows and artists it changes.
+        Arrays get spare capacity, the name index becomes lowercase name ->
+        track records, and the track -> artists table becomes per-row
+        (start, end) spans into an append-only pool of artist rows. The
+        CSR arrays they replace are dropped rather than left stale.
+        """
+        if self._buffers is not None:
+            return
+        if not isinstance(self.tracks, list):
+            self._build_track_objects()
+        
+        def buffer(values, dtype, width=None):
+            grown = _GrowingArray(dtype, width)
+            grown.append(values)
+            return grown
+        
+        width = len(FEATURE_COLUMNS)
+        offsets = self.track_artist_offsets
+        counts = self.artist_track_counts
+        sums = self.artist_features * counts[:, None]
+        if len(self.artist_track_rows):
+            # Exact sums, not centroid * count, so later updates do not drift
+            sums = np.add.reduceat(self.features[self.artist_track_rows], self.artist_offsets[:-1],
+                                   axis=0)
+        self._buffers = {
+            'features': buffer(self.features, self.features.dtype, width),
+            'track_ids': buffer(self.track_ids, object),
+            'track_names': buffer(self.track_names, object),
+            'artist_features': buffer(self.artist_features, self.artist_features.dtype, width),
+            'artist_track_counts': buffer(counts, np.int64),
+            'artist_norms': buffer(self.artist_norms, np.float64),
+            '_artist_sums': buffer(sums, np.float64, width),
+            '_track_artist_spans': buffer(np.column_stack((offsets[:-1], offsets[1:])), np.int64, 2),
+            '_track_artist_pool': buffer(self.track_artist_codes, np.int64)
+        }
+        
+        tracks = self.tracks
+        self._name_tracks = {
+            name: [tracks[row] for row in self.name_rows[self.name_offsets[code]:self.name_offsets[code + 1]].tolist()]
+            for code, name in enumerate(self.name_to_code)
+        }
+        self.artist_offsets = self.artist_track_rows = None
+        self.name_to_code = self.name_offsets = self.name_rows = None
+        self.track_artist_offsets = self.track_artist_codes = None
+        self._sync_buffers()
+    
+    def _apply_precision(self):
+        """Convert the loaded feature matrices to the storage precision"""
+        if self.precision == 'float64' or self.backend == 'memmap':
+            return
+        self.features = self.features.astype(self.precision)
+        self.artist_features = self.artist_features.astype(self.precision)
+        # Restored catalogs build records on access, parsed ones share _track_table
+        table = self.tracks if isinstance(self.tracks, TrackView) else self._track_table
+        if table is not None:
+            table.features = self.features
+    
+    def _drop_update_state(self):
+        self._buffers = None
+        self._name_tracks = None
+    
+    def _sync_buffers(self):
+        """Point the public arrays (and the track records' table) at the buffers"""
+        for name, grown in self._buffers.items():
+            setattr(self, name, grown.view)
+        table = self._track_table
+        table.track_ids, table.track_names, table.features = self.track_ids, self.track_names, self.features
+    
+    def _add_artist(self, artist):
+        """Register a new artist with no tracks yet; returns its row"""
+        artist = sys.intern(artist)
+        a = len(self.artists)
+        self.artists.append(artist)
+        self.artist_to_row[artist] = a
+        self.artist_music[artist] = []
+        for name in ('artist_features', 'artist_track_counts', 'artist_norms', '_artist_sums'):
+            self._buffers[name].extend_to(a + 1)
+        return a
+    
+    def _add_rows(self, track_ids, track_names, features, artist_strings):
+        """Append tracks and update every index and centroid they touch"""
+        buffers = self._buffers
+        start = len(self.tracks)
+        count = len(track_ids)
+        
+        pair_rows, pair_codes, pool_codes, spans = [], [], [], []
+        pool_start = buffers['_track_artist_pool'].size
+        for i, artists_str in enumerate(artist_strings.tolist()):
+            codes = []
+            for artist in self._parse_artists(artists_str):
+                code = self.artist_to_row.get(artist)
+                if code is None:
+                    code = self._add_artist(artist)
+                codes.append(code)
+            pair_rows.extend([start + i] * len(codes))
+            pair_codes.extend(codes)
+            # The track -> artists table lists each artist once, in artist row order
+            codes = sorted(set(codes))
+            spans.append((pool_start + len(pool_codes), pool_start + len(pool_codes) + len(codes)))
+            pool_codes.extend(codes)
+        
+        buffers['features'].append(features)
+        buffers['track_ids'].append(track_ids)
+        buffers['track_names'].append(_share_strings(track_names))
+        buffers['_track_artist_pool'].append(np.array(pool_codes, dtype=np.int64))
+        buffers['_track_artist_spans'].append(np.array(spans, dtype=np.int64).reshape(-1, 2))
+        self._sync_buffers()
+        
+        table = self._track_table
+        new_tracks = [TrackRecord(table, row) for row in range(start, start + count)]
+        self.tracks.extend(new_tracks)
+        for row, code in zip(pair_rows, pair_codes):
+            self.artist_music[self.artists[code]].append(self.tracks[row])
+        
+        for i, track_id in enumerate(track_ids.tolist()):
+            row = start + i
+            first = self.id_to_row.setdefault(track_id, row)
+            if first != row:
+                self.duplicate_id_rows.setdefault(track_id, [first]).append(row)
+        for track, name in zip(new_tracks, self.track_names[start:].tolist()):
+            self._name_tracks.setdefault(name.lower(), []).append(track)
+        
+        # Running sums: only the artists of the new tracks change
+        pair_codes = np.array(pair_codes, dtype=np.int64)
+        np.add.at(self._artist_sums, pair_codes, self.features[np.array(pair_rows, dtype=np.int64)])
+        np.add.at(self.artist_track_counts, pair_codes, 1)
+        self._update_centroids(np.unique(pair_codes))
+        return count
+    
+    def _update_centroids(self, codes):
+        """Recompute the centroids and norms of some artists from their running sums"""
+        if len(codes):
+            self.artist_features[codes] = self._artist_sums[codes] / self.artist_track_counts[codes, None]
+            self.artist_norms[codes] = np.linalg.norm(self.artist_features[codes], axis=1)
+    
+    def _remove_rows(self, rows):
+        """Remove tracks by row, highest row first, moving the last row into each gap"""
+        for row in rows:
+            self._unlink_row(row)
+            last = len(self.tracks) - 1
+            if row != last:
+                self._move_row(last, row)
+            self.tracks.pop()
+            for name in ('features', 'track_ids', 'track_names', '_track_artist_spans'):
+                self._buffers[name].truncate(last)
+        self._sync_buffers()
+    
+    def _unlink_row(self, row):
+        """Take the track at row out of the ID, name and artist indexes"""
+        track = self.tracks[row]
+        track_id = self.track_ids[row]
+        values = self.features[row].copy()
+        
+        duplicates = self.duplicate_id_rows.get(track_id)
+        if duplicates:
+            duplicates.remove(row)
+            self.id_to_row[track_id] = min(duplicates)
+            if len(duplicates) == 1:
+                del self.duplicate_id_rows[track_id]
+        else:
+            del self.id_to_row[track_id]
+        
+        name = self.track_names[row]
+        same_name = self._name_tracks[name.lower()]
+        same_name[:] = [other for other in same_name if other is not track]
+        if not same_name:
+            del self._name_tracks[name.lower()]
+        
+        emptied = []
+        start, end = self._track_artist_spans[row].tolist()
+        for code in self._track_artist_pool[start:end].tolist():
+            artist_tracks = self.artist_music[self.artists[code]]
+            kept = [other for other in artist_tracks if other is not track]
+            # A track listed twice under one artist counted twice
+            times = len(artist_tracks) - len(kept)
+            artist_tracks[:] = kept
+            self.artist_track_counts[code] -= times
+            if np.isnan(values).any():
+                # NaN cannot be subtracted back out; re-add what is left
+                self._artist_sums[code] = self.features[[other.row for other in kept]].sum(axis=0)
+            else:
+                self._artist_sums[code] -= values * times
+            if self.artist_track_counts[code] == 0:
+                emptied.append(code)
+            else:
+                self._update_centroids(np.array([code]))
+        for code in sorted(emptied, reverse=True):
+            self._remove_artist(code)
+        
+        # Records handed out earlier keep their values
+        track.table = TrackView(np.array([track_id], dtype=object), np.array([name], dtype=object),
+                                values[None, :])
+        track.row = 0
+    
+    def _move_row(self, source, target):
+        """Move the track at source into the free row target"""
+        for name in ('features', 'track_ids', 'track_names', '_track_artist_spans'):
+            array = self._buffers[name].view
+            array[target] = array[source]
+        track = self.tracks[target] = self.tracks[source]
+        track.row = target
+        
+        track_id = self.track_ids[target]
+        duplicates = self.duplicate_id_rows.get(track_id)
+        if duplicates:
+            duplicates[duplicates.index(source)] = target
+            self.id_to_row[track_id] = min(duplicates)
+        else:
+            self.id_to_row[track_id] = target
+    
+    def _remove_artist(self, code):
+        """Drop an artist without tracks, moving the last artist into its row"""
+        artist = self.artists[code]
+        del self.artist_to_row[artist]
+        del self.artist_music[artist]
+        last = len(self.artists) - 1
+        if code != last:
+            moved = self.artists[last]
+            self.artists[code] = moved
+            self.artist_to_row[moved] = code
+            for name in ('artist_features', 'artist_track_counts', 'artist_norms', '_artist_sums'):
+                array = self._buffers[name].view
+                array[code] = array[last]
+            # Renumber the moved artist in its tracks' artist lists
+            pool = self._track_artist_pool
+            for row in {track.row for track in self.artist_music[moved]}:
+                start, end = self._track_artist_spans[row].tolist()
+                codes = pool[start:end]
+                codes[codes == last] = code
+                codes.sort()
+        self.artists.pop()
+        for name in ('artist_features', 'artist_track_counts', 'artist_norms', '_artist_sums'):
+            self._buffers[name].truncate(last)
+        self._sync_buffers()
+    
+    def _parse_artists(self, artists_str):
+        """Parse artists string into list (memoized per raw string; do not modify the result)"""
+        if isinstance(artists_str, str):
+            artists = self._artists_memo.get(artists_str)
+            if artists is None:
+                if len(self._artists_memo) >= ARTISTS_MEMO_SIZE:
+                    self._artists_memo.clear()
+                artists = self._artists_memo[artists_str] = _parse_artists_string(artists_str)
+            return artists
+        
+        import pandas as pd
+        if pd.isna(artists_str) or not artists_str:
+            return ['Unknown Artist']
+        return _parse_artists_string(str(artists_str))
     
     def get_artist_music(self):
         """Get the artist-music dictionary"""
-        if not self.loaded:
-            self.load_data()
+        self._ensure_loaded()
         return self.artist_music
     
     def get_all_artists(self):
         """Get list of all artists"""
-        if not self.loaded:
-            self.load_data()
+        self._ensure_loaded()
         return self.artists
     
     def get_all_tracks(self):
-        """Get list of all tracks"""
-        if not self.loaded:
-            self.load_data()
-        return self.tracks
+        """Get list of all tracks (lazy view over the feature matrix)"""
+        self._ensure_loaded()
+        return TrackView(self.track_ids, self.track_names, self.features)
+    
+    def get_track_row(self, track_id):
+        """Get the feature matrix row of a track ID, or None"""
+        self._ensure_loaded()
+        return self.id_to_row.get(track_id)
     
     def get_tracks_by_artist(self, artist_name):
         """Get tracks by artist"""
-        if not self.loaded:
-            self.load_data()
+        self._ensure_loaded()
         return self.artist_music.get(artist_name, [])
     
+    def get_artist_row(self, artist_name):
+        """Get the centroid matrix row of an artist, or None"""
+        self._ensure_loaded()
+        return self.artist_to_row.get(artist_name)
+    
     def get_track_by_id(self, track_id):
         """Get track by ID"""
-        if not self.loaded:
-            self.load_data()
+        self._ensure_loaded()
+        
+        row = self.id_to_row.get(track_id)
+        if row is None:
+            return None
+        return self.tracks[row]
+    
+    def get_track_artists(self, row):
+        """Get the artists of the track at a feature matrix row"""
+        self._ensure_loaded()
+        
+        if self._buffers is not None:
+            start, end = self._buffers['_track_artist_spans'].view[row].tolist()
+            codes = self._buffers['_track_artist_pool'].view[start:end]
+        else:
+            codes = self.track_artist_codes[self.track_artist_offsets[row]:self.track_artist_offsets[row + 1]]
+        return [self.artists[code] for code in codes.tolist()]
+    
+    def _name_rows(self, name_lower):
+        """Get the rows of all tracks whose lowercase name equals name_lower"""
+        if self.feature_store is not None:
+            return self.feature_store.name_index.rows(name_lower)
+        if self._name_tracks is not None:
+            return [track.row for track in self._name_tracks.get(name_lower, ())]
         
-        for track in self.tracks:
-            if track['id'] == track_id:
-                return track
-        return None
+        code = self.name_to_code.get(name_lower)
+        if code is None:
+            return []
+        return self.name_rows[self.name_offsets[code]:self.name_offsets[code + 1]].tolist()
     
     def get_tracks_by_name(self, track_name):
         """Get tracks by name"""
-        if not self.loaded:
-            self.load_data()
+        self._ensure_loaded()
         
         results = []
-        track_name_lower = track_name.lower()
-        
-        for track in self.tracks:
-            if track['name'].lower() == track_name_lower:
-                # Find artist for this track
-                for artist, tracks in self.artist_music.items():
-                    if track in tracks:
-                        results.append((artist, track))
-                        break
+        for row in self._name_rows(track_name.lower()):
+            # First artist in artist_music order, as before
+            artists = self.get_track_artists(row)
+            if artists:
+                results.append((artists[0], self.tracks[row]))
         
         return results
     
+    def get_matching_rows(self, item):
+        """Get the rows whose track ID or name equals item exactly"""
+        self._ensure_loaded()
+        
+        if self.feature_store is not None:
+            rows = set(self.feature_store.id_index.rows(item))
+        else:
+            rows = set(self.duplicate_id_rows.get(item, ()))
+            row = self.id_to_row.get(item)
+            if row is not None:
+                rows.add(row)
+        
+        rows.update(row for row in self._name_rows(item.lower()) if self.track_names[row] == item)
+        return np.array(sorted(rows), dtype=np.int64)
+    
     def search_artists(self, query):
         """Search for artists"""
-        if not self.loaded:
-            self.load_data()
+        self._ensure_loaded()
         
         query = query.lower()
         return [artist for artist in self.artists if query in artist.lower()]
\ No newline at end of file
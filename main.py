@@ -2,10 +2,203 @@
 main.py - Complete working version
 """
 
+import time
+
+# Taken before anything else is imported, the zero point of --startup-report
+STARTUP_T0 = time.perf_counter()
+
 import sys
 import os
+import argparse
+import contextlib
+import threading
+
+# Rows parsed per chunk when streaming data.csv
+LOAD_CHUNK_SIZE = 100000
+
+class StartupTimeline:
+    """Start-up milestones for --startup-report, in ms since main.py started"""
+    
+    def __init__(self):
+        self.events = []
+        self._lock = threading.Lock()
+        self.mark("GUI start-up begins")
+    
+    def mark(self, name):
+        with self._lock:
+            self.events.append((name, (time.perf_counter() - STARTUP_T0) * 1000))
+    
+    def report(self, path='-'):
+        """Print the milestones like -X importtime: step time | cumulative | milestone"""
+        lines = ["startup: step ms | cumulative ms | milestone"]
+        previous = 0.0
+        for name, at in self.events:
+            lines.append(f"startup: {at - previous:7.1f} | {at:13.1f} | {name}")
+            previous = at
+        text = "\n".join(lines) + "\n"
+        if path == '-':
+            sys.stderr.write(text)
+        else:
+            with open(path, 'w') as f:
+                f.write(text)
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Music recommendation engine")
+    parser.add_argument('--data', default='data.csv', help="dataset CSV file")
+    parser.add_argument('--metrics', action='store_true',
+                        help="turn on timers and counters (shown in the GUI status bar)")
+    parser.add_argument('--startup-report', nargs='?', const='-', metavar='FILE',
+                        help="time start-up milestones, quit once the GUI is ready and "
+                             "print the report (to FILE if given)")
+    parser.add_argument('--metrics-out', metavar='FILE',
+                        help="write instrumentation at exit (.prom for Prometheus text, else JSON)")
+    parser.add_argument('--feature-space', choices=['raw', 'scaled'], default='raw',
+                        help="score raw features, or standardized, pre-normalized ones")
+    parser.add_argument('--precision', choices=['float64', 'float32', 'int8'], default='float64',
+                        help="precision of the matrices top-k searches scan")
+    parser.add_argument('--rerank', type=int, default=0, metavar='N',
+                        help="rescore the best N reduced-precision candidates in float64")
+    
+    batch = parser.add_argument_group("batch mode (no GUI)")
+    batch.add_argument('--batch', metavar='INPUT',
+                       help="answer queries from a JSONL/CSV file, or '-' for stdin")
+    batch.add_argument('--output', default='-', help="result file, or '-' for stdout")
+    batch.add_argument('--input-format', choices=['auto', 'jsonl', 'csv'], default='auto')
+    batch.add_argument('--output-format', choices=['jsonl', 'csv'], default='jsonl')
+    batch.add_argument('--type', choices=['artist', 'track'], default='artist',
+                       help="item type for queries that do not set one")
+    batch.add_argument('--metric', choices=['cosine', 'euclidean', 'pearson', 'manhattan'],
+                       default='cosine', help="metric for queries that do not set one")
+    batch.add_argument('--top-n', type=int, default=5, help="results per query")
+    batch.add_argument('--workers', type=int, default=2, help="threads answering batches")
+    batch.add_argument('--max-in-flight', type=int, default=4,
+                       help="batches queued or running at once; bounds memory")
+    batch.add_argument('--batch-size', type=int, default=256, help="queries per batched scan")
+    batch.add_argument('--unordered', action='store_true',
+                       help="write results as batches finish instead of in input order")
+    return parser.parse_args(argv)
+
+def run_batch_mode(args):
+    """Stream recommendations for every query in args.batch"""
+    from load_dataset_module import DataLoader
+    from similarity_module import SimilarityCalculator
+    from batch_query_module import CSVResultWriter, JSONLResultWriter, read_queries, run_queries
+    
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    source = sys.stdin if args.batch == '-' else open(args.batch, newline='', encoding='utf-8')
+    try:
+        # Progress and errors go to stderr so stdout carries only results
+        with contextlib.redirect_stdout(sys.stderr):
+            if not os.path.exists(args.data):
+                print(f"Data file not found: {args.data}")
+                return 1
+            loader = DataLoader(args.data, chunk_size=LOAD_CHUNK_SIZE,
+                                progress_callback=print_load_progress)
+            if not loader.load_data():
+                print("Failed to load data.")
+                return 1
+            calculator = SimilarityCalculator(loader, **calculator_options(args))
+            
+            writer = (CSVResultWriter if args.output_format == 'csv' else JSONLResultWriter)(out)
+            defaults = {'type': args.type, 'metric': args.metric, 'n': args.top_n}
+            queries = read_queries(source, args.input_format,
+                                   None if args.batch == '-' else args.batch, defaults)
+            count = run_queries(calculator, queries, writer, args.workers, args.max_in_flight,
+                                args.batch_size, not args.unordered)
+            print(f"✅ Answered {count} queries")
+        return 0
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+def write_metrics(path):
+    """Dump the instrumentation registry to a file"""
+    from instrumentation_module import registry
+    with open(path, 'w') as f:
+        f.write(registry.to_prometheus() if path.endswith('.prom') else registry.to_json(indent=2))
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.metrics or args.metrics_out:
+        from instrumentation_module import registry
+        registry.enable()
+    try:
+        if args.batch:
+            return run_batch_mode(args)
+        return run_gui(args)
+    finally:
+        if args.metrics_out:
+            write_metrics(args.metrics_out)
+
+def calculator_options(args):
+    """SimilarityCalculator keyword arguments chosen on the command line"""
+    return {'feature_space': args.feature_space, 'precision': args.precision,
+            'rerank': args.rerank}
+
+def load_engine(data_file, progress_callback=None, timeline=None, **options):
+    """Load the dataset and build the calculator; returns (loader, calculator)
 
-def main():
+    Runs on a background thread while the window is already up, so the
+    heavy modules are imported here rather than at start-up. options are
+    passed on to SimilarityCalculator.
+    """
+    from load_dataset_module import DataLoader
+    if timeline:
+        timeline.mark("import load_dataset_module")
+    
+    def report_progress(rows_loaded, fraction):
+        print_load_progress(rows_loaded, fraction)
+        if progress_callback is not None:
+            progress_callback(rows_loaded, fraction)
+    
+    print("\n1. Loading dataset...")
+    
+    # Check data file
+    if not os.path.exists(data_file):
+        print(f"Data file not found: {data_file}")
+        create_sample_data(data_file)
+    
+    # Load data
+    loader = DataLoader(data_file, chunk_size=LOAD_CHUNK_SIZE, progress_callback=report_progress)
+    data = loader.load_data()
+    
+    if not data:
+        print("Failed to load data. Creating fresh sample...")
+        create_sample_data(data_file)
+        loader = DataLoader(data_file, chunk_size=LOAD_CHUNK_SIZE, progress_callback=report_progress)
+        data = loader.load_data()
+        
+        if not data:
+            raise RuntimeError(f"Still failed to load {data_file}")
+    
+    print(f"✅ Loaded data for {len(data)} artists")
+    if timeline:
+        timeline.mark("dataset loaded")
+    
+    # Show sample info
+    artists = loader.get_all_artists()
+    if artists:
+        print(f"\n🎵 Sample artists in dataset:")
+        for i, artist in enumerate(artists[:5], 1):
+            tracks = loader.get_tracks_by_artist(artist)
+            print(f"   {i}. {artist} ({len(tracks)} tracks)")
+    
+    # Create similarity calculator
+    print("\n2. Initializing similarity calculator...")
+    from similarity_module import SimilarityCalculator
+    calculator = SimilarityCalculator(loader, **options)
+    print("✅ Calculator ready")
+    if timeline:
+        timeline.mark("calculator ready")
+    return loader, calculator
+
+def run_gui(args):
+    """Open the recommendation window at once and load the dataset behind it"""
+    timeline = StartupTimeline() if args.startup_report else None
+    
     print("=" * 60)
     print("MUSIC RECOMMENDATION ENGINE")
     print("=" * 60)
@@ -18,57 +211,42 @@ def main():
         if modules_dir not in sys.path:
             sys.path.insert(0, modules_dir)
         
-        # Import modules
-        from load_dataset_module import DataLoader
-        from similarity_module import SimilarityCalculator
+        # Only the window is imported up front; pandas/NumPy/SciPy load in the background
         from user_interface_module import RecommendationGUI
+        if timeline:
+            timeline.mark("import user_interface_module")
         
-        print("\n1. Loading dataset...")
-        
-        # Check data file
-        data_file = 'data.csv'
-        if not os.path.exists(data_file):
-            print(f"Data file not found: {data_file}")
-            create_sample_data()
+        try:
+            app = RecommendationGUI()
+        except Exception as e:
+            if not timeline:
+                raise
+            # No display: the report still covers imports and loading
+            print(f"⚠️ Cannot open a window ({e}); loading without GUI")
+            load_engine(args.data, timeline=timeline, **calculator_options(args))
+            timeline.report(args.startup_report)
+            return
         
-        # Load data
-        loader = DataLoader(data_file)
-        data = loader.load_data()
+        app.root.update()
+        if timeline:
+            timeline.mark("first window drawn")
         
-        if not data:
-            print("Failed to load data. Creating fresh sample...")
-            create_sample_data()
-            loader = DataLoader(data_file)
-            data = loader.load_data()
-            
-            if not data:
-                print("Still failed to load data. Exiting.")
-                return
+        def on_ready(app):
+            if timeline:
+                timeline.mark("controls enabled")
+                # Report mode measures start-up only
+                app.root.after(0, app.root.quit)
         
-        print(f"✅ Loaded data for {len(data)} artists")
-        
-        # Show sample info
-        artists = loader.get_all_artists()
-        if artists:
-            print(f"\n🎵 Sample artists in dataset:")
-            for i, artist in enumerate(artists[:5], 1):
-                tracks = loader.get_tracks_by_artist(artist)
-                print(f"   {i}. {artist} ({len(tracks)} tracks)")
-        
-        # Create similarity calculator
-        print("\n2. Initializing similarity calculator...")
-        calculator = SimilarityCalculator(loader)
-        print("✅ Calculator ready")
-        
-        # Launch GUI
-        print("\n3. Launching GUI...")
-        app = RecommendationGUI(loader, calculator)
-        print("✅ GUI loaded successfully")
+        app.start_loading(lambda: load_engine(args.data, app.report_load_progress, timeline,
+                                              **calculator_options(args)),
+                          on_ready)
         print("\n" + "=" * 60)
-        print("Application ready! Close the window to exit.")
+        print("Window open, dataset loading in the background. Close the window to exit.")
         print("=" * 60 + "\n")
         
         app.run()
+        if timeline:
+            timeline.report(args.startup_report)
         
     except ImportError as e:
         print(f"\n❌ Import Error: {e}")
@@ -83,7 +261,11 @@ def main():
         import traceback
         traceback.print_exc()
 
-def create_sample_data():
+def print_load_progress(rows_loaded, fraction):
+    """Print streaming load progress"""
+    print(f"   ... {rows_loaded} rows loaded ({fraction:.0%})")
+
+def create_sample_data(path='data.csv'):
     """Create sample dataset"""
     try:
         import pandas as pd
@@ -114,11 +296,11 @@ def create_sample_data():
             })
         
         df = pd.DataFrame(data)
-        df.to_csv('data.csv', index=False)
+        df.to_csv(path, index=False)
         print(f"✅ Created sample data with {len(df)} tracks")
         
     except Exception as e:
         print(f"Error creating sample data: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+parallel_search_module.py - Multi-core exact top-k search
+
+The feature matrix is published once to a pool of worker processes:
+in-memory matrices are copied into a multiprocessing.shared_memory block,
+memory-mapped ones are simply re-opened from their file. Each query is
+split into contiguous row shards, every worker returns the top k of its
+shard, and the parent merges them. The pool stays up between queries.
+"""
+
+import os
+import weakref
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from similarity_module import CHUNK_SIZE, top_k_indices, top_k_scan
+
+# Per-process view of the published matrix, set by _attach
+_worker_matrix = None
+_worker_shm = None
+
+
+def _attach(source, shape, dtype):
+    """Pool initializer: map the published matrix without copying it"""
+    global _worker_matrix, _worker_shm
+    kind, name, offset = source
+    if kind == 'shm':
+        _worker_shm = shared_memory.SharedMemory(name=name)
+        _worker_matrix = np.ndarray(shape, dtype=dtype, buffer=_worker_shm.buf)
+    else:
+        _worker_matrix = np.memmap(name, dtype=dtype, mode='r', shape=shape, offset=offset)
+
+
+def _search_shard(args):
+    """Top k of rows [start, stop) of the published matrix, in global rows"""
+    start, stop, vec, metric, k, exclude, chunk_size = args
+    local_exclude = exclude[(exclude >= start) & (exclude < stop)] - start
+    rows, scores = top_k_scan(_worker_matrix[start:stop], vec, metric, k, local_exclude,
+                              chunk_size)
+    return rows + start, scores
+
+
+def _release(pool, shm):
+    """Stop a pool and free its shared memory; must not hold the searcher alive"""
+    pool.terminate()
+    pool.join()
+    if shm is not None:
+        shm.close()
+        shm.unlink()
+
+
+class ParallelSearcher:
+    """A warm pool of worker processes sharing one feature matrix
+
+    The pool and shared memory are released by close(), or at the latest
+    when the searcher is garbage collected or the process exits.
+    """
+
+    def __init__(self, matrix, n_workers=None, chunk_size=CHUNK_SIZE):
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.n_rows = len(matrix)
+        self._shm = None
+
+        if isinstance(matrix, np.memmap) and matrix.filename is not None:
+            source = ('memmap', matrix.filename, matrix.offset)
+            dtype = matrix.dtype
+        else:
+            matrix = np.ascontiguousarray(matrix, dtype=np.float64)
+            self._shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+            np.ndarray(matrix.shape, dtype=matrix.dtype, buffer=self._shm.buf)[:] = matrix
+            source = ('shm', self._shm.name, 0)
+            dtype = matrix.dtype
+
+        try:
+            self._pool = Pool(self.n_workers, initializer=_attach,
+                              initargs=(source, matrix.shape, dtype))
+        except Exception:
+            if self._shm is not None:
+                self._shm.close()
+                self._shm.unlink()
+            raise
+        self._finalizer = weakref.finalize(self, _release, self._pool, self._shm)
+
+    def _shards(self):
+        """Contiguous [start, stop) row ranges, one per worker"""
+        bounds = np.linspace(0, self.n_rows, self.n_workers + 1).astype(np.int64)
+        return [(lo, hi) for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()) if hi > lo]
+
+    def top_k(self, vec, metric='cosine', k=5, exclude=()):
+        """Top k rows scoring above zero across all shards
+
+        Returns (rows, scores), best first, as top_k_scan would (up to the
+        last bit of BLAS rounding on different block shapes).
+        """
+        vec = np.asarray(vec, dtype=np.float64)
+        exclude = np.asarray(exclude, dtype=np.int64)
+        tasks = [(lo, hi, vec, metric, k, exclude, self.chunk_size) for lo, hi in self._shards()]
+        results = self._pool.map(_search_shard, tasks)
+
+        # Shards come back in row order, so ties still resolve like one scan
+        rows = np.concatenate([r for r, _ in results] + [np.empty(0, dtype=np.int64)])
+        scores = np.concatenate([s for _, s in results] + [np.empty(0)])
+        keep = top_k_indices(scores, np.ones(len(scores), dtype=bool), k)
+        return rows[keep], scores[keep]
+
+    def close(self):
+        """Stop the workers and release the shared memory"""
+        # The finalizer runs at most once, whether called here, on collection or at exit
+        self._finalizer()
+        self._pool = None
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,271 @@
+"""
+quantization_module.py - Reduced-precision copies of feature matrices
+
+A top-k scan reads every row of a feature matrix, so bytes per row bound
+it more than arithmetic does. SimilarityCalculator(precision='float32')
+scans a float32 copy (half the bytes); precision='int8' scans a
+QuantizedMatrix: one signed byte per feature with a per-feature scale
+and offset,
+
+    x[i, j] ~ offset[j] + scale[j] * codes[i, j]
+
+plus the float32 squared norm of every reconstructed row. Cosine and
+euclidean (and the dot kernels of the scaled feature space) are scored
+from the codes without dequantizing them: the query is folded into one
+weight per feature, so a block costs one small matrix product.
+
+    x . q      = codes @ (scale * q) + offset . q
+    |x - q|^2  = |x|^2 - 2 x . q + |q|^2
+
+Other metrics dequantize one block at a time. Scores are approximate;
+SimilarityCalculator(rerank=n) rescores the best n candidates in full
+precision, which restores the exact top k whenever it is among them.
+
+precision_report() measures the memory saved and the top-k agreement
+with float64 on a loaded catalog:
+
+    python quantization_module.py --data data.csv --k 10 --rerank 50
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+PRECISIONS = ['float64', 'float32', 'int8']
+
+# Kernels QuantizedMatrix scores straight from the codes
+DIRECT_METRICS = ['cosine', 'euclidean', 'cosine_dot', 'pearson_dot']
+
+# Codes run from -QUANT_LEVELS to QUANT_LEVELS
+QUANT_LEVELS = 127
+
+# Rows converted per block when building a reduced copy
+REDUCE_CHUNK = 65536
+
+
+class QuantizedMatrix:
+    """Per-feature int8 codes of a feature matrix
+
+    Rows with missing features keep codes of 0 and a NaN squared norm,
+    so they score NaN and are never recommended. Indexing returns
+    dequantized float64 rows.
+    """
+
+    def __init__(self, codes, scale, offset, sq_norms):
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.sq_norms = sq_norms
+
+    @classmethod
+    def fit(cls, matrix, chunk_size=REDUCE_CHUNK):
+        """Quantize a matrix, spreading each feature's finite range over the codes"""
+        width = matrix.shape[1]
+        lo = np.full(width, np.inf)
+        hi = np.full(width, -np.inf)
+        for start in range(0, len(matrix), chunk_size):
+            block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+            finite = np.isfinite(block)
+            lo = np.minimum(lo, np.where(finite, block, np.inf).min(axis=0, initial=np.inf))
+            hi = np.maximum(hi, np.where(finite, block, -np.inf).max(axis=0, initial=-np.inf))
+        # Features without any finite value quantize around zero
+        empty = lo > hi
+        lo[empty] = hi[empty] = 0.0
+        offset = (lo + hi) / 2
+        scale = (hi - lo) / (2 * QUANT_LEVELS)
+        scale[scale == 0] = 1.0
+
+        codes = np.empty(matrix.shape, dtype=np.int8)
+        sq_norms = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), chunk_size):
+            block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+            valid = np.isfinite(block).all(axis=1)
+            block_codes = np.rint((block - offset) / scale)
+            block_codes[~np.isfinite(block_codes)] = 0
+            np.clip(block_codes, -QUANT_LEVELS, QUANT_LEVELS, out=block_codes)
+            codes[start:start + len(block)] = block_codes
+            norms = np.square(offset + scale * block_codes).sum(axis=1)
+            sq_norms[start:start + len(block)] = np.where(valid, norms, np.nan)
+        return cls(codes, scale, offset, sq_norms)
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.sq_norms.nbytes + self.scale.nbytes + self.offset.nbytes
+
+    def __getitem__(self, index):
+        values = self.offset + self.scale * self.codes[index]
+        values[np.isnan(self.sq_norms[index])] = np.nan
+        return values
+
+    def block_scores(self, queries, start, stop, metric):
+        """Score queries against rows start:stop from the codes (len(queries) x rows)
+
+        metric is one of DIRECT_METRICS.
+        """
+        queries = np.asarray(queries, dtype=np.float64)
+        weights = (queries * self.scale).astype(np.float32)
+        dots = (self.codes[start:stop].astype(np.float32) @ weights.T).T.astype(np.float64)
+        dots += (queries @ self.offset)[:, None]
+        sq_norms = self.sq_norms[start:stop].astype(np.float64)
+
+        if metric == 'euclidean':
+            distance = dots
+            distance *= -2
+            distance += sq_norms
+            distance += np.square(queries).sum(axis=1)[:, None]
+            # Rounding can leave a tiny negative square for a near-identical row
+            np.maximum(distance, 0, out=distance)
+            np.sqrt(distance, out=distance)
+            distance += 1
+            return np.reciprocal(distance, out=distance)
+
+        dots[:, np.isnan(sq_norms)] = np.nan
+        if metric == 'cosine':
+            mags = np.outer(np.linalg.norm(queries, axis=1), np.sqrt(sq_norms))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(mags == 0, 0.0, dots / mags)
+        if metric == 'pearson_dot':
+            dots += 1
+            dots /= 2
+        return dots
+
+
+def reduce_precision(matrix, precision, chunk_size=REDUCE_CHUNK):
+    """A float32 copy or QuantizedMatrix of a matrix; float64 returns it unchanged"""
+    if precision == 'float64':
+        return matrix
+    if precision == 'int8':
+        return QuantizedMatrix.fit(matrix, chunk_size)
+    if isinstance(matrix, np.ndarray) and not isinstance(matrix, np.memmap) \
+            and matrix.dtype == np.float32:
+        return matrix
+    reduced = np.empty(matrix.shape, dtype=np.float32)
+    for start in range(0, len(matrix), chunk_size):
+        block = matrix[start:start + chunk_size]
+        reduced[start:start + len(block)] = block
+    return reduced
+
+
+def _agreement(expected, found):
+    """Share of the expected names that were found, counting repeated names"""
+    if not expected:
+        return 1.0
+    return sum((Counter(expected) & Counter(found)).values()) / len(expected)
+
+
+def precision_report(loader, item_type='track', metrics=('cosine', 'euclidean'), k=10,
+                     queries=100, rerank=50, feature_space='raw', seed=0):
+    """Compare reduced-precision top-k search against float64 on a loaded catalog
+
+    Returns one row per (precision, rerank depth, metric) with the bytes
+    of the scanned matrix, the fraction saved against float64, the mean
+    top-k overlap with float64, the share of queries with the exact
+    float64 result list, and the mean query time.
+    """
+    from similarity_module import SimilarityCalculator
+
+    loader.get_all_tracks()
+    rng = np.random.default_rng(seed)
+    if item_type == 'track':
+        pool = loader.track_ids
+    else:
+        pool = loader.get_all_artists()
+    items = [pool[i] for i in rng.choice(len(pool), min(queries, len(pool)), replace=False).tolist()]
+
+    configs = [('float64', 0)]
+    for precision in ('float32', 'int8'):
+        configs.append((precision, 0))
+        if rerank:
+            configs.append((precision, rerank))
+
+    expected = {}
+    rows = []
+    for precision, depth in configs:
+        calculator = SimilarityCalculator(loader, cache_size=0, feature_space=feature_space,
+                                          precision=precision, rerank=depth)
+        for metric in metrics:
+            # The first query builds the reduced copy; keep it out of the timing
+            calculator.get_top_similar(items[0], item_type, metric, k)
+            results = []
+            started = time.perf_counter()
+            for item in items:
+                results.append([name for name, _ in calculator.get_top_similar(item, item_type,
+                                                                                metric, k)])
+            elapsed = time.perf_counter() - started
+            if precision == 'float64':
+                expected[metric] = results
+
+            full_bytes = calculator.matrix_nbytes(item_type, metric, 'float64')
+            nbytes = calculator.matrix_nbytes(item_type, metric)
+            rows.append({
+                'precision': precision,
+                'rerank': depth,
+                'metric': metric,
+                'bytes': nbytes,
+                'saved': 1 - nbytes / full_bytes if full_bytes else 0.0,
+                'agreement': float(np.mean([_agreement(e, f) for e, f
+                                            in zip(expected[metric], results)])),
+                'exact': float(np.mean([e == f for e, f in zip(expected[metric], results)])),
+                'ms_per_query': elapsed / len(items) * 1000
+            })
+        calculator.close()
+    return rows
+
+
+def print_report(rows, k):
+    print(f"{'precision':<10} {'rerank':>6} {'metric':<10} {'MB':>9} {'saved':>7} "
+          f"{f'top-{k} overlap':>14} {'exact':>7} {'ms/query':>9}")
+    for row in rows:
+        print(f"{row['precision']:<10} {row['rerank']:>6} {row['metric']:<10} "
+              f"{row['bytes'] / 1e6:9.2f} {row['saved']:7.1%} {row['agreement']:14.1%} "
+              f"{row['exact']:7.1%} {row['ms_per_query']:9.3f}")
+
+
+def main(argv=None):
+    from load_dataset_module import DataLoader
+    from similarity_module import METRICS
+
+    parser = argparse.ArgumentParser(description='Memory and top-k agreement of reduced precision')
+    parser.add_argument('--data', default='data.csv', help='dataset CSV file')
+    parser.add_argument('--backend', choices=['memory', 'memmap'], default='memory')
+    parser.add_argument('--item-type', choices=['artist', 'track'], default='track')
+    parser.add_argument('--metrics', default='cosine,euclidean',
+                        help=f"comma-separated, from {', '.join(METRICS)}")
+    parser.add_argument('--k', type=int, default=10, help='results per query')
+    parser.add_argument('--queries', type=int, default=100, help='sampled query items')
+    parser.add_argument('--rerank', type=int, default=50,
+                        help='candidates rescored in full precision (0 to skip)')
+    parser.add_argument('--feature-space', choices=['raw', 'scaled'], default='raw')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    if args.backend == 'memmap' and args.feature_space != 'raw':
+        parser.error('--feature-space scaled needs the memory backend')
+
+    metrics = [metric.strip() for metric in args.metrics.split(',') if metric.strip()]
+    unknown = [metric for metric in metrics if metric not in METRICS]
+    if unknown:
+        print(f"Unknown metric: {', '.join(unknown)}")
+        return 1
+
+    loader = DataLoader(args.data, backend=args.backend)
+    if not loader.load_data():
+        print("Failed to load data.")
+        return 1
+    rows = precision_report(loader, args.item_type, metrics, args.k, args.queries, args.rerank,
+                            args.feature_space, args.seed)
+    print_report(rows, args.k)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""
+server.py - Headless HTTP/JSON recommendation service
+
+Serves the engine over plain HTTP on localhost using only asyncio from the
+standard library. Top-k queries that arrive within a short window are
+grouped by (type, metric) and answered with one batched matrix scan.
+
+Endpoints (GET with query parameters, or POST with a JSON body):
+    /health                                  dataset size
+    /similarity?item1=..&item2=..&type=..&metric=..
+    /top?item=..&type=..&metric=..&n=..
+    /stats                                   cache and batching counters
+    /metrics                                 instrumentation, Prometheus text
+                                             (/metrics?format=json for JSON)
+
+With --watch the CSV is polled for changes; a replacement is loaded in
+the background and swapped in atomically (see hot_reload_module), and
+every request is answered from the dataset that was current when it
+arrived.
+
+Usage:
+    python server.py --port 8000 [--watch]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from feature_space_module import FEATURE_SPACES
+from hot_reload_module import LiveDataset
+from instrumentation_module import registry
+from load_dataset_module import STORAGE_PRECISIONS, DataLoader
+from quantization_module import PRECISIONS
+from similarity_module import METRICS, SimilarityCalculator
+
+ITEM_TYPES = ['artist', 'track']
+
+# Largest request body accepted, in bytes
+MAX_BODY_SIZE = 1 << 20
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+
+class HTTPError(Exception):
+    """An error answered with a JSON body and an HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """Collect top-k queries for a short window and answer them in one scan"""
+
+    def __init__(self, calculator, executor, window=0.005, max_batch=64):
+        self.calculator = calculator
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = {}
+        self.batches = 0
+        self.queries = 0
+
+    async def submit(self, item, item_type, metric, top_n, calculator=None):
+        """Queue one query and wait for its results
+
+        calculator overrides the batcher's own; queries are only batched
+        with others for the same calculator (dataset snapshot).
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (calculator or self.calculator, item_type, metric)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            loop.call_later(self.window, self._flush, key, batch)
+        batch.append((item, top_n, future))
+        if len(batch) >= self.max_batch:
+            self._flush(key, batch)
+        return await future
+
+    def _flush(self, key, batch):
+        """Start the scan for a batch, unless it was already started"""
+        if self._pending.get(key) is not batch:
+            return
+        del self._pending[key]
+        asyncio.ensure_future(self._run(key, batch))
+
+    async def _run(self, key, batch):
+        calculator, item_type, metric = key
+        # One scan for the deepest request; shorter ones are cut down afterwards
+        top_n = max(n for _, n, _ in batch)
+        items = [item for item, _, _ in batch]
+        self.batches += 1
+        self.queries += len(batch)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, calculator.get_top_similar_many, items, item_type, metric, top_n)
+        except Exception as e:
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, n, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result[:n])
+
+
+class RecommendationServer:
+    """asyncio HTTP server in front of a DataLoader and SimilarityCalculator
+
+    Given a LiveDataset, every request instead uses the loader and
+    calculator of the snapshot that is current when it arrives.
+    """
+
+    def __init__(self, loader, calculator, host='127.0.0.1', port=8000, workers=2,
+                 max_connections=64, max_pending=256, batch_window=0.005, max_batch=64, live=None):
+        self.loader = loader
+        self.calculator = calculator
+        self.live = live
+        self.host = host
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.batcher = MicroBatcher(calculator, self.executor, batch_window, max_batch)
+        self.max_pending = max_pending
+        self._connections = asyncio.Semaphore(max_connections)
+        self._in_flight = 0
+        self.rejected = 0
+
+    def _dataset(self):
+        """Get the (loader, calculator) a request should use from start to finish"""
+        if self.live is not None:
+            snapshot = self.live.current
+            return snapshot.loader, snapshot.calculator
+        return self.loader, self.calculator
+
+    def _params(self, method, target, body):
+        """Merge query-string parameters with a JSON object body"""
+        url = urlsplit(target)
+        params = dict(parse_qsl(url.query))
+        if method == 'POST' and body:
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                raise HTTPError(400, 'Body is not valid JSON')
+            if not isinstance(payload, dict):
+                raise HTTPError(400, 'Body must be a JSON object')
+            params.update(payload)
+        return url.path, params
+
+    def _query_options(self, params):
+        item_type = params.get('type', 'artist')
+        metric = params.get('metric', 'cosine')
+        if item_type not in ITEM_TYPES:
+            raise HTTPError(400, f"type must be one of {', '.join(ITEM_TYPES)}")
+        if metric not in METRICS:
+            raise HTTPError(400, f"metric must be one of {', '.join(METRICS)}")
+        return item_type, metric
+
+    def _required(self, params, name):
+        value = params.get(name)
+        if not isinstance(value, str) or not value.strip():
+            raise HTTPError(400, f"Missing parameter: {name}")
+        return value.strip()
+
+    async def dispatch(self, method, target, body):
+        """Answer one request with (status, payload); str payloads are sent as text"""
+        if method not in ('GET', 'POST'):
+            raise HTTPError(405, f"Method {method} not allowed")
+        path, params = self._params(method, target, body)
+        loader, calculator = self._dataset()
+
+        if path == '/health':
+            health = {'status': 'ok', 'artists': len(loader.get_all_artists()),
+                      'tracks': len(loader.features)}
+            if self.live is not None:
+                health.update(generation=self.live.current.generation, reloads=self.live.reloads,
+                              failed_reloads=self.live.failed_reloads)
+            return 200, health
+
+        if path == '/metrics':
+            if params.get('format') == 'json':
+                return 200, registry.snapshot()
+            return 200, registry.to_prometheus()
+
+        if path == '/stats':
+            return 200, {'cache': calculator.cache_stats(),
+                         'batches': self.batcher.batches, 'batched_queries': self.batcher.queries,
+                         'in_flight': self._in_flight, 'rejected': self.rejected}
+
+        if path not in ('/similarity', '/top'):
+            raise HTTPError(404, f"Unknown endpoint: {path}")
+
+        item_type, metric = self._query_options(params)
+        if self._in_flight >= self.max_pending:
+            self.rejected += 1
+            raise HTTPError(503, 'Too many queries in flight, retry later')
+
+        self._in_flight += 1
+        try:
+            if path == '/similarity':
+                item1 = self._required(params, 'item1')
+                item2 = self._required(params, 'item2')
+                similarity = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, calculator.compute_similarity, item1, item2, item_type, metric)
+                return 200, {'item1': item1, 'item2': item2, 'type': item_type, 'metric': metric,
+                             'similarity': similarity}
+
+            item = self._required(params, 'item')
+            try:
+                top_n = int(params.get('n', 5))
+            except (TypeError, ValueError):
+                raise HTTPError(400, 'n must be an integer')
+            if top_n < 1:
+                raise HTTPError(400, 'n must be at least 1')
+            results = await self.batcher.submit(item, item_type, metric, top_n, calculator)
+            return 200, {'item': item, 'type': item_type, 'metric': metric,
+                         'results': [{'name': name, 'score': score} for name, score in results]}
+        finally:
+            self._in_flight -= 1
+
+    async def _read_request(self, reader):
+        """Read one request: (method, target, headers, body), or None at EOF"""
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise HTTPError(400, 'Malformed request line')
+        method, target, _ = parts
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, 'Request body too large')
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, headers, body
+
+    async def _write_response(self, writer, status, payload, keep_alive):
+        # Strings (Prometheus text) go out as-is, everything else as JSON
+        if isinstance(payload, str):
+            body, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+        else:
+            body, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until it closes"""
+        async with self._connections:
+            try:
+                while True:
+                    keep_alive = False
+                    try:
+                        request = await self._read_request(reader)
+                        if request is None:
+                            break
+                        method, target, headers, body = request
+                        keep_alive = headers.get('connection', '').lower() != 'close'
+                        status, payload = await self.dispatch(method, target, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {'error': str(e)}
+                    except (asyncio.IncompleteReadError, ConnectionError):
+                        break
+                    except Exception as e:
+                        status, payload = 500, {'error': str(e)}
+                    await self._write_response(writer, status, payload, keep_alive)
+                    if not keep_alive:
+                        break
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+    async def serve(self):
+        """Run until cancelled"""
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        print(f"🌐 Serving on http://{self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='HTTP/JSON music recommendation service')
+    parser.add_argument('--data', default='data.csv', help='dataset CSV file')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=2, help='threads running similarity work')
+    parser.add_argument('--max-connections', type=int, default=64)
+    parser.add_argument('--max-pending', type=int, default=256,
+                        help='queries in flight before new ones get 503')
+    parser.add_argument('--batch-window-ms', type=float, default=5.0)
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--backend', choices=['memory', 'memmap'], default='memory')
+    parser.add_argument('--feature-space', choices=FEATURE_SPACES, default='raw',
+                        help='score raw features, or standardized, pre-normalized ones')
+    parser.add_argument('--storage-precision', choices=STORAGE_PRECISIONS, default='float64',
+                        help='dtype the loaded feature matrices are kept in (memory backend)')
+    parser.add_argument('--precision', choices=PRECISIONS, default='float64',
+                        help='precision of the matrices top-k searches scan')
+    parser.add_argument('--rerank', type=int, default=0, metavar='N',
+                        help='rescore the best N reduced-precision candidates in float64')
+    parser.add_argument('--metrics', action='store_true', help='turn on instrumentation')
+    parser.add_argument('--watch', action='store_true',
+                        help='reload the dataset in the background when the CSV changes')
+    parser.add_argument('--watch-interval', type=float, default=2.0,
+                        help='seconds between checks of the CSV')
+    args = parser.parse_args(argv)
+    if args.backend == 'memmap' and args.feature_space != 'raw':
+        parser.error('--feature-space scaled needs the memory backend')
+    if args.backend == 'memmap' and args.storage_precision != 'float64':
+        parser.error('--storage-precision other than float64 needs the memory backend')
+    if args.metrics:
+        registry.enable()
+
+    if not os.path.exists(args.data):
+        print(f"Data file not found: {args.data}")
+        return 1
+
+    live = LiveDataset(args.data,
+                       lambda path: DataLoader(path, backend=args.backend,
+                                               precision=args.storage_precision),
+                       lambda loader: SimilarityCalculator(loader, feature_space=args.feature_space,
+                                                           precision=args.precision,
+                                                           rerank=args.rerank))
+    if not live.load():
+        print("Failed to load data.")
+        return 1
+    if args.watch:
+        live.start_watching(args.watch_interval)
+
+    snapshot = live.current
+    server = RecommendationServer(snapshot.loader, snapshot.calculator, args.host, args.port,
+                                  args.workers, args.max_connections, args.max_pending,
+                                  args.batch_window_ms / 1000, args.max_batch, live=live)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\n👋 Server stopped")
+    finally:
+        live.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,152 +2,447 @@
 similarity_module.py - Complete working version
 """
 
-import math
+import time
+
+import numpy as np
+from load_dataset_module import FEATURE_COLUMNS
+from instrumentation_module import registry
+from feature_space_module import DOT_METRICS, FEATURE_SPACES, FeatureSpace
+from quantization_module import DIRECT_METRICS, PRECISIONS, QuantizedMatrix, reduce_precision
+from ann_index_module import ANN_METRICS, IVFIndex
+from result_cache_module import LRUCache
+
+# scipy.spatial once imported by _spatial(), False when SciPy is missing
+_scipy_spatial = None
+
+METRICS = ['cosine', 'euclidean', 'pearson', 'manhattan']
+
+# Minkowski p of the distance behind each 1 / (1 + d) metric
+TREE_METRICS = {'euclidean': 2, 'manhattan': 1}
+
+# Rows scored per block, bounds the temporaries of one scan
+CHUNK_SIZE = 65536
+
+
+def _cosine_scores(matrix, vec, norms=None):
+    """Cosine similarity of every row of matrix against vec"""
+    dots = matrix @ vec
+    if norms is None:
+        norms = np.linalg.norm(matrix, axis=1)
+    mags = norms * np.linalg.norm(vec)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(mags == 0, 0.0, dots / mags)
+
+
+def _euclidean_scores(matrix, vec, norms=None):
+    """Euclidean similarity 1 / (1 + distance) of every row against vec"""
+    distance = np.sqrt(np.square(matrix - vec).sum(axis=1))
+    return 1 / (1 + distance)
+
+
+def _pearson_scores(matrix, vec, norms=None):
+    """Pearson correlation of every row against vec, mapped to [0, 1]"""
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    vec_centered = vec - vec.mean()
+    numerator = centered @ vec_centered
+    denom = np.linalg.norm(centered, axis=1) * np.linalg.norm(vec_centered)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = numerator / denom
+    return np.where(denom == 0, 0.0, (correlation + 1) / 2)
+
+
+def _manhattan_scores(matrix, vec, norms=None):
+    """Manhattan similarity 1 / (1 + distance) of every row against vec"""
+    distance = np.abs(matrix - vec).sum(axis=1)
+    return 1 / (1 + distance)
+
+
+def _cosine_dot_scores(matrix, vec, norms=None):
+    """Cosine similarity of unit rows against a unit vector: one dot product"""
+    return matrix @ vec
+
+
+def _pearson_dot_scores(matrix, vec, norms=None):
+    """Pearson of centered unit rows against a centered unit vector, mapped to [0, 1]"""
+    scores = matrix @ vec
+    scores += 1
+    scores /= 2
+    return scores
+
+
+_KERNELS = {
+    'cosine': _cosine_scores,
+    'euclidean': _euclidean_scores,
+    'pearson': _pearson_scores,
+    'manhattan': _manhattan_scores,
+    # Rows prepared by feature_space_module (scaled feature space)
+    'cosine_dot': _cosine_dot_scores,
+    'pearson_dot': _pearson_dot_scores
+}
+
+
+def _spatial():
+    """Import scipy.spatial on first use (it is slow to import); None without SciPy"""
+    global _scipy_spatial
+    if _scipy_spatial is None:
+        try:
+            import scipy.spatial
+            import scipy.spatial.distance
+            _scipy_spatial = scipy.spatial
+        except ImportError:
+            _scipy_spatial = False
+    return _scipy_spatial or None
+
+
+def _pairwise_distance(rows, cols, p):
+    """Minkowski distances between every row of two blocks (p = 1 or 2)"""
+    spatial = _spatial()
+    if spatial is not None:
+        return spatial.distance.cdist(rows, cols, 'euclidean' if p == 2 else 'cityblock')
+    diff = np.abs(rows[:, None, :] - cols[None, :, :])
+    if p == 2:
+        return np.sqrt(np.square(diff).sum(axis=2))
+    return diff.sum(axis=2)
+
+
+def pairwise_scores(rows, cols, metric='cosine'):
+    """Score every row of one block against every row of another (len(rows) x len(cols))
+
+    A float32 cols block (precision='float32') is scored in float32.
+    """
+    dtype = np.float32 if getattr(cols, 'dtype', None) == np.float32 else np.float64
+    rows = np.asarray(rows, dtype=dtype)
+    cols = np.asarray(cols, dtype=dtype)
+    
+    if metric in ('cosine_dot', 'pearson_dot'):
+        scores = rows @ cols.T
+        if metric == 'pearson_dot':
+            scores += 1
+            scores /= 2
+        return scores
+    
+    if metric in ('cosine', 'pearson'):
+        if metric == 'pearson':
+            rows = rows - rows.mean(axis=1, keepdims=True)
+            cols = cols - cols.mean(axis=1, keepdims=True)
+        dots = rows @ cols.T
+        mags = np.outer(np.linalg.norm(rows, axis=1), np.linalg.norm(cols, axis=1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = dots / mags
+        if metric == 'pearson':
+            scores = (scores + 1) / 2
+        return np.where(mags == 0, 0.0, scores)
+    
+    # 1 / (1 + d) computed in place: the distance block can be large
+    scores = _pairwise_distance(rows, cols, 2 if metric == 'euclidean' else 1)
+    np.add(scores, 1, out=scores)
+    return np.reciprocal(scores, out=scores)
+
+
+def score_matrix(matrix, vec, metric='cosine', chunk_size=CHUNK_SIZE, norms=None):
+    """Score every row of a feature matrix against one query vector
+
+    norms optionally holds precomputed row norms, used by cosine.
+    """
+    kernel = _KERNELS[metric]
+    vec = np.asarray(vec, dtype=np.float64)
+    scores = np.empty(len(matrix), dtype=np.float64)
+    for start in range(0, len(matrix), chunk_size):
+        block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+        block_norms = None if norms is None else norms[start:start + len(block)]
+        scores[start:start + len(block)] = kernel(block, vec, block_norms)
+    return scores
+
+
+def top_k_indices(scores, candidates, k):
+    """Indices of the k best candidate scores, best first
+
+    Uses a partial selection; ties keep catalog order like a stable sort.
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    
+    idx = np.flatnonzero(candidates)
+    if len(idx) > k:
+        part = np.argpartition(-scores[idx], k - 1)[:k]
+        threshold = scores[idx[part]].min()
+        idx = idx[scores[idx] >= threshold]
+    
+    order = np.lexsort((idx, -scores[idx]))
+    return idx[order[:k]]
+
+
+def top_k_scan(matrix, vec, metric='cosine', k=5, exclude=(), chunk_size=CHUNK_SIZE, norms=None):
+    """Top k rows of a matrix scoring above zero, scanned block by block
+
+    Only the running top k survives each block, so memory stays bounded
+    by chunk_size whatever the number of rows (e.g. a memory-mapped
+    matrix). Returns (rows, scores), best first.
+    """
+    kernel = _KERNELS[metric]
+    vec = np.asarray(vec, dtype=np.float64)
+    exclude = np.asarray(exclude, dtype=np.int64)
+    best_rows = np.empty(0, dtype=np.int64)
+    best_scores = np.empty(0, dtype=np.float64)
+    timed = registry.enabled
+    score_time = select_time = 0.0
+    
+    for start in range(0, len(matrix), chunk_size):
+        if timed:
+            started = time.perf_counter()
+        block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+        block_norms = None if norms is None else norms[start:start + len(block)]
+        scores = kernel(block, vec, block_norms)
+        if timed:
+            scored = time.perf_counter()
+            score_time += scored - started
+        
+        candidates = scores > 0
+        local = exclude[(exclude >= start) & (exclude < start + len(block))] - start
+        candidates[local] = False
+        top = top_k_indices(scores, candidates, k)
+        
+        # Earlier blocks come first, so ties still resolve in row order
+        rows = np.concatenate((best_rows, top + start))
+        merged = np.concatenate((best_scores, scores[top]))
+        keep = top_k_indices(merged, np.ones(len(merged), dtype=bool), k)
+        best_rows, best_scores = rows[keep], merged[keep]
+        if timed:
+            select_time += time.perf_counter() - scored
+    
+    if timed:
+        registry.observe('similarity_stage', score_time, stage='score', metric=metric)
+        registry.observe('similarity_stage', select_time, stage='select', metric=metric)
+    return best_rows, best_scores
+
+
+def _merge_top_k(best_cols, best_scores, scores, start, k):
+    """Fold one column tile into the running top k of every row
+    
+    Invalid entries of scores must already be -inf. Ties resolve in column
+    order, like top_k_indices.
+    """
+    if scores.shape[1] > k:
+        part = np.sort(np.argpartition(-scores, k - 1, axis=1)[:, :k], axis=1)
+        # Rows where the k-th best value is tied outside the selection need an exact pick
+        kth = np.take_along_axis(scores, part, axis=1).min(axis=1)
+        tied = np.flatnonzero(((scores >= kth[:, None]).sum(axis=1) > k) & np.isfinite(kth))
+        for i in tied.tolist():
+            part[i] = np.sort(top_k_indices(scores[i], scores[i] > -np.inf, k))
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    
+    # Earlier tiles come first, so a stable sort keeps ties in column order
+    cols = np.concatenate((best_cols, part + start), axis=1)
+    merged = np.concatenate((best_scores, np.take_along_axis(scores, part, axis=1)), axis=1)
+    keep = np.argsort(-merged, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(cols, keep, axis=1), np.take_along_axis(merged, keep, axis=1)
+
+
+def top_k_many(matrix, queries, metric='cosine', k=5, exclude=None, chunk_size=CHUNK_SIZE):
+    """Top k rows scoring above zero for several query vectors in one scan
+
+    Each block of the matrix is scored against all queries at once.
+    exclude optionally holds two parallel arrays (query index, row) of
+    pairs to skip. Returns (rows, scores), each len(queries) x k, best
+    first, with missing slots as -1 / -inf. matrix may also be a
+    QuantizedMatrix, scored from its codes where the metric allows.
+    """
+    queries = np.asarray(queries, dtype=np.float64)
+    direct = isinstance(matrix, QuantizedMatrix) and metric in DIRECT_METRICS
+    if exclude is not None:
+        exclude_queries = np.asarray(exclude[0], dtype=np.int64)
+        exclude_rows = np.asarray(exclude[1], dtype=np.int64)
+    best_rows = np.full((len(queries), 0), -1, dtype=np.int64)
+    best_scores = np.full((len(queries), 0), -np.inf)
+    
+    for start in range(0, len(matrix), chunk_size):
+        stop = min(start + chunk_size, len(matrix))
+        if direct:
+            scores = matrix.block_scores(queries, start, stop, metric)
+        else:
+            scores = pairwise_scores(queries, matrix[start:stop], metric)
+        # Scores of zero or below (and NaN) are never recommended
+        scores[~(scores > 0)] = -np.inf
+        if exclude is not None:
+            local = (exclude_rows >= start) & (exclude_rows < stop)
+            scores[exclude_queries[local], exclude_rows[local] - start] = -np.inf
+        best_rows, best_scores = _merge_top_k(best_rows, best_scores, scores, start, k)
+    
+    if best_rows.shape[1] < k:
+        pad = k - best_rows.shape[1]
+        best_rows = np.pad(best_rows, ((0, 0), (0, pad)), constant_values=-1)
+        best_scores = np.pad(best_scores, ((0, 0), (0, pad)), constant_values=-np.inf)
+    best_rows[best_scores == -np.inf] = -1
+    return best_rows, best_scores
+
+
+def rerank_top_k(matrix, queries, metric, candidates, k=5):
+    """Rescore candidate rows exactly and keep the best k of each query
+
+    candidates are rows as returned by top_k_many (-1 for empty slots),
+    matrix the full-precision matrix they index. Only the candidate rows
+    are read. Returns (rows, scores) like top_k_many.
+    """
+    queries = np.asarray(queries, dtype=np.float64)
+    best_rows = np.full((len(queries), k), -1, dtype=np.int64)
+    best_scores = np.full((len(queries), k), -np.inf)
+    for i, rows in enumerate(candidates):
+        # Catalog order, so ties resolve like a full scan
+        rows = np.sort(rows[rows >= 0])
+        scores = pairwise_scores(queries[i:i + 1], np.asarray(matrix[rows], dtype=np.float64),
+                                 metric)[0]
+        top = top_k_indices(scores, scores > 0, k)
+        best_rows[i, :len(top)] = rows[top]
+        best_scores[i, :len(top)] = scores[top]
+    return best_rows, best_scores
+
+
+def threshold_scan(matrix, vec, metric='cosine', min_score=0.5, exclude=(), chunk_size=CHUNK_SIZE,
+                   norms=None):
+    """All rows scoring at least min_score, scanned block by block
+
+    Returns (rows, scores), best first.
+    """
+    kernel = _KERNELS[metric]
+    vec = np.asarray(vec, dtype=np.float64)
+    exclude = np.asarray(exclude, dtype=np.int64)
+    found_rows = []
+    found_scores = []
+    
+    for start in range(0, len(matrix), chunk_size):
+        block = np.asarray(matrix[start:start + chunk_size], dtype=np.float64)
+        block_norms = None if norms is None else norms[start:start + len(block)]
+        scores = kernel(block, vec, block_norms)
+        
+        hits = np.flatnonzero(scores >= min_score)
+        hits = hits[~np.isin(hits + start, exclude)]
+        found_rows.append(hits + start)
+        found_scores.append(scores[hits])
+    
+    rows = np.concatenate(found_rows + [np.empty(0, dtype=np.int64)])
+    scores = np.concatenate(found_scores + [np.empty(0)])
+    order = np.lexsort((rows, -scores))
+    return rows[order], scores[order]
+
+
+def distance_to_similarity(distance):
+    """The 1 / (1 + d) mapping used by the euclidean and manhattan metrics"""
+    return 1 / (1 + distance)
+
+
+def similarity_to_distance(similarity):
+    """Inverse of distance_to_similarity"""
+    return 1 / similarity - 1
+
 
 class SimilarityCalculator:
-    def __init__(self, data_loader):
+    def __init__(self, data_loader, chunk_size=CHUNK_SIZE, ann_lists=None, ann_probes=8,
+                 use_tree=True, workers=None, cache_size=1024, cache_ttl=None, feature_space='raw',
+                 precision='float64', rerank=0):
         self.loader = data_loader
+        self.chunk_size = chunk_size
+        
+        # 'raw' scores the features as loaded; 'scaled' scores standardized rows
+        # prepared once per load (see feature_space_module). The prepared copy
+        # lives in RAM, which would defeat the bounded memory of memmap
+        if feature_space not in FEATURE_SPACES:
+            raise ValueError(f"Unknown feature space: {feature_space}")
+        if feature_space != 'raw' and getattr(data_loader, 'backend', 'memory') == 'memmap':
+            raise ValueError("The scaled feature space needs the memory backend")
+        self.feature_space = feature_space
+        self._scaler = None
+        self._prepared = {}
+        
+        # Top-k searches scan a float32 or int8 copy of the matrix unless
+        # 'float64'; rerank > 0 rescores that many of the best candidates
+        # in full precision (see quantization_module)
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision: {precision}")
+        self.precision = precision
+        self.rerank = rerank
+        self._reduced = {}
+        
+        # Exact KD-tree search for euclidean/manhattan, one tree per item type
+        self.use_tree = use_tree
+        self._trees = {}
+        
+        # Approximate track search: recall/speed knobs and one IVF index per metric
+        self.ann_lists = ann_lists
+        self.ann_probes = ann_probes
+        self._ann_indexes = {}
+        
+        # Exact scans split across a warm process pool, one pool per item type
+        self.workers = workers
+        self._searchers = {}
+        
+        # Recent results, emptied whenever the loader reloads its data
+        self.cache = LRUCache(cache_size, cache_ttl)
         print("SimilarityCalculator initialized")
     
     def _get_track_features(self, identifier):
         """Get features for a track by ID or name"""
         # Try by ID first
-        track = self.loader.get_track_by_id(identifier)
+        row = self.loader.get_track_row(identifier)
+        if row is not None:
+            registry.count('track_resolution', outcome='id')
+            return self.loader.features[row].tolist()
         
         # If not found by ID, try by name
-        if not track:
-            tracks = self.loader.get_tracks_by_name(identifier)
-            if tracks:
-                track = tracks[0][1]  # Take first match
-        
-        if not track:
+        tracks = self.loader.get_tracks_by_name(identifier)
+        if not tracks:
+            registry.count('track_resolution', outcome='miss')
             return None
+        registry.count('track_resolution', outcome='name')
+        
+        track = tracks[0][1]  # Take first match
         
         # Return feature vector
-        return [
-            track['acousticness'],
-            track['danceability'],
-            track['energy'],
-            track['liveness'],
-            track['loudness'],
-            track['popularity'],
-            track['speechiness'],
-            track['tempo'],
-            track['valence']
-        ]
+        return [track[feature] for feature in FEATURE_COLUMNS]
     
     def _get_artist_features(self, artist_name):
         """Get average features for an artist"""
-        tracks = self.loader.get_tracks_by_artist(artist_name)
-        if not tracks:
+        row = self.loader.get_artist_row(artist_name)
+        if row is None:
             return None
-        
-        # Initialize feature accumulators
-        features = {
-            'acousticness': [], 'danceability': [], 'energy': [],
-            'liveness': [], 'loudness': [], 'popularity': [],
-            'speechiness': [], 'tempo': [], 'valence': []
-        }
-        
-        # Collect features from all tracks
-        for track in tracks:
-            for feature in features:
-                features[feature].append(track[feature])
-        
-        # Calculate averages
-        avg_features = []
-        for feature in ['acousticness', 'danceability', 'energy', 'liveness',
-                       'loudness', 'popularity', 'speechiness', 'tempo', 'valence']:
-            if features[feature]:
-                avg_features.append(sum(features[feature]) / len(features[feature]))
-            else:
-                avg_features.append(0)
-        
-        return avg_features
+        return self.loader.artist_features[row].tolist()
     
-    def euclidean_similarity(self, item1, item2, item_type='track'):
-        """Euclidean distance similarity"""
+    def _get_features(self, item, item_type):
+        """Get the feature vector of a track or artist"""
         if item_type == 'track':
-            vec1 = self._get_track_features(item1)
-            vec2 = self._get_track_features(item2)
-        else:
-            vec1 = self._get_artist_features(item1)
-            vec2 = self._get_artist_features(item2)
+            return self._get_track_features(item)
+        return self._get_artist_features(item)
+    
+    def _pair_similarity(self, item1, item2, item_type, metric):
+        """Score two items with the vectorized kernel of a metric"""
+        vec1 = self._get_features(item1, item_type)
+        vec2 = self._get_features(item2, item_type)
         
         if not vec1 or not vec2:
             return 0
         
-        # Calculate Euclidean distance
-        distance = math.sqrt(sum((a - b) ** 2 for a, b in zip(vec1, vec2)))
-        return 1 / (1 + distance)
+        if self.feature_space == 'raw':
+            return float(score_matrix(np.array([vec2]), vec1, metric)[0])
+        score = float(score_matrix(self._query(vec2, metric)[None, :], self._query(vec1, metric),
+                                   self._kernel(metric))[0])
+        # Vectors without a direction are NaN in the scaled space
+        return 0.0 if np.isnan(score) else score
+    
+    def euclidean_similarity(self, item1, item2, item_type='track'):
+        """Euclidean distance similarity"""
+        return self._pair_similarity(item1, item2, item_type, 'euclidean')
     
     def cosine_similarity(self, item1, item2, item_type='track'):
         """Cosine similarity"""
-        if item_type == 'track':
-            vec1 = self._get_track_features(item1)
-            vec2 = self._get_track_features(item2)
-        else:
-            vec1 = self._get_artist_features(item1)
-            vec2 = self._get_artist_features(item2)
-        
-        if not vec1 or not vec2:
-            return 0
-        
-        # Calculate dot product and magnitudes
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        mag1 = math.sqrt(sum(a ** 2 for a in vec1))
-        mag2 = math.sqrt(sum(b ** 2 for b in vec2))
-        
-        if mag1 == 0 or mag2 == 0:
-            return 0
-        
-        return dot_product / (mag1 * mag2)
+        return self._pair_similarity(item1, item2, item_type, 'cosine')
     
     def pearson_similarity(self, item1, item2, item_type='track'):
         """Pearson correlation similarity"""
-        if item_type == 'track':
-            vec1 = self._get_track_features(item1)
-            vec2 = self._get_track_features(item2)
-        else:
-            vec1 = self._get_artist_features(item1)
-            vec2 = self._get_artist_features(item2)
-        
-        if not vec1 or not vec2 or len(vec1) != len(vec2):
-            return 0
-        
-        n = len(vec1)
-        
-        # Calculate means
-        mean1 = sum(vec1) / n
-        mean2 = sum(vec2) / n
-        
-        # Calculate numerator and denominator
-        numerator = sum((a - mean1) * (b - mean2) for a, b in zip(vec1, vec2))
-        denom1 = math.sqrt(sum((a - mean1) ** 2 for a in vec1))
-        denom2 = math.sqrt(sum((b - mean2) ** 2 for b in vec2))
-        
-        if denom1 == 0 or denom2 == 0:
-            return 0
-        
-        correlation = numerator / (denom1 * denom2)
-        # Convert from [-1, 1] to [0, 1]
-        return (correlation + 1) / 2
+        return self._pair_similarity(item1, item2, item_type, 'pearson')
     
     def manhattan_similarity(self, item1, item2, item_type='track'):
         """Manhattan distance similarity"""
-        if item_type == 'track':
-            vec1 = self._get_track_features(item1)
-            vec2 = self._get_track_features(item2)
-        else:
-            vec1 = self._get_artist_features(item1)
-            vec2 = self._get_artist_features(item2)
-        
-        if not vec1 or not vec2:
-            return 0
-        
-        # Calculate Manhattan distance
-        distance = sum(abs(a - b) for a, b in zip(vec1, vec2))
-        return 1 / (1 + distance)
+        return self._pair_similarity(item1, item2, item_type, 'manhattan')
     
     def compute_similarity(self, item1, item2, item_type='track', metric='cosine'):
         """Compute similarity using specified metric"""
@@ -162,39 +457,346 @@ class SimilarityCalculator:
             print(f"Unknown metric: {metric}. Using cosine.")
             metric = 'cosine'
         
-        return metrics[metric](item1, item2, item_type)
+        # Every metric is symmetric, so (a, b) and (b, a) share one entry. The
+        # key carries the version read before computing, so a result that raced
+        # an update is never served for the new data
+        with registry.timer('compute_similarity', metric=metric, item_type=item_type):
+            version = self.loader.version
+            self.cache.sync(version)
+            key = ('pair', *sorted((item1, item2), key=str), item_type, metric, version)
+            similarity = self.cache.get(key)
+            registry.count('cache_lookups', kind='pair', result='miss' if similarity is None else 'hit')
+            if similarity is None:
+                similarity = metrics[metric](item1, item2, item_type)
+                self.cache.put(key, similarity)
+            return similarity
+    
+    def cache_stats(self):
+        """Get hit/miss/eviction counters of the result cache"""
+        return self.cache.stats()
+    
+    def build_ann_index(self, metric='cosine', n_lists=None):
+        """Build the approximate track index used by get_top_similar(use_ann=True)"""
+        self.loader.get_all_tracks()
+        index = IVFIndex(metric, n_lists or self.ann_lists, self.ann_probes)
+        index.build(self._space('track', metric, self.loader.features))
+        self._ann_indexes[metric] = (self.loader.version, index)
+        return index
+    
+    def _get_ann_index(self, metric):
+        """Get the approximate index for a metric, rebuilding it after a reload"""
+        entry = self._ann_indexes.get(metric)
+        if entry is None or entry[0] != self.loader.version:
+            return self.build_ann_index(metric)
+        return entry[1]
+    
+    def _get_tree(self, key, matrix):
+        """Get the KD-tree over a feature matrix, or None if it cannot be used
+
+        key names the matrix (item type, feature space). Trees need the
+        matrix in memory and finite, so the memmap backend and catalogs
+        with missing features fall back to scanning.
+        """
+        if not self.use_tree or self.loader.feature_store is not None or _spatial() is None:
+            return None
+        
+        entry = self._trees.get(key)
+        if entry is None or entry[0] != self.loader.version:
+            tree = _spatial().cKDTree(matrix) if len(matrix) and np.isfinite(matrix).all() else None
+            entry = (self.loader.version, tree)
+            self._trees[key] = entry
+        return entry[1]
+    
+    def _tree_top_k(self, tree, matrix, vec, metric, k, exclude):
+        """Exact top k by distance, using the tree to bound the candidates"""
+        p = TREE_METRICS[metric]
+        n_query = min(len(matrix), k + len(exclude))
+        if k <= 0 or n_query == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        
+        distances, _ = tree.query(vec, k=n_query, p=p)
+        radius = np.atleast_1d(distances)[-1]
+        # Everything as close as the furthest hit, so ties resolve like a full scan
+        rows = np.sort(np.array(tree.query_ball_point(vec, radius * (1 + 1e-9) + 1e-12, p=p),
+                                dtype=np.int64))
+        scores = _KERNELS[metric](matrix[rows], vec)
+        top = top_k_indices(scores, (scores > 0) & ~np.isin(rows, exclude), k)
+        return rows[top], scores[top]
+    
+    def _get_searcher(self, key, matrix):
+        """Get the worker pool sharing a feature matrix, restarting it after a reload"""
+        entry = self._searchers.get(key)
+        if entry is None or entry[0] != self.loader.version:
+            from parallel_search_module import ParallelSearcher
+            if entry is not None:
+                entry[1].close()
+            entry = (self.loader.version, ParallelSearcher(matrix, self.workers, self.chunk_size))
+            self._searchers[key] = entry
+        return entry[1]
+    
+    def close(self):
+        """Shut down any worker pools"""
+        for _, searcher in self._searchers.values():
+            searcher.close()
+        self._searchers = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _space_name(self, metric):
+        """Name of the matrix a metric searches: 'raw', 'standardized', 'cosine' or 'pearson'"""
+        if self.feature_space == 'raw':
+            return 'raw'
+        return metric if metric in DOT_METRICS else 'standardized'
+    
+    def _kernel(self, metric):
+        """Kernel name that scores the matrix of _space_name(metric)"""
+        if self.feature_space == 'raw' or metric not in DOT_METRICS:
+            return metric
+        return f'{metric}_dot'
+    
+    def _get_scaler(self):
+        """Standardization fitted on the track catalog, refitted after a reload"""
+        if self._scaler is None or self._scaler[0] != self.loader.version:
+            self.loader.get_all_tracks()
+            self._scaler = (self.loader.version, FeatureSpace.fit(self.loader.features, self.chunk_size))
+        return self._scaler[1]
+    
+    def _space(self, item_type, metric, matrix):
+        """The matrix a metric searches: matrix itself, or its prepared copy when scaled"""
+        name = self._space_name(metric)
+        if name == 'raw':
+            return matrix
+        entry = self._prepared.get((item_type, name))
+        if entry is None or entry[0] != self.loader.version:
+            entry = (self.loader.version, self._get_scaler().prepare(matrix, metric, self.chunk_size))
+            self._prepared[(item_type, name)] = entry
+        return entry[1]
+    
+    def _reduced_matrix(self, item_type, metric, matrix):
+        """The float32 or int8 copy of a search matrix, rebuilt after a reload"""
+        key = (item_type, self._space_name(metric))
+        entry = self._reduced.get(key)
+        if entry is None or entry[0] != self.loader.version:
+            entry = (self.loader.version, reduce_precision(matrix, self.precision, self.chunk_size))
+            self._reduced[key] = entry
+        return entry[1]
+    
+    def _batched_top_k(self, item_type, metric, matrix, queries, k, exclude):
+        """top_k_many over the matrix in the calculator's precision, reranked if asked"""
+        if self.precision == 'float64':
+            return top_k_many(matrix, queries, self._kernel(metric), k, exclude, self.chunk_size)
+        
+        depth = max(k, self.rerank)
+        rows, scores = top_k_many(self._reduced_matrix(item_type, metric, matrix), queries,
+                                  self._kernel(metric), depth, exclude, self.chunk_size)
+        if self.rerank:
+            return rerank_top_k(matrix, queries, self._kernel(metric), rows, k)
+        return rows[:, :k], scores[:, :k]
+    
+    def matrix_nbytes(self, item_type, metric='cosine', precision=None):
+        """Bytes of the matrix top-k searches of a metric scan, in a precision (default: own)"""
+        if item_type == 'artist':
+            matrix = self.loader.artist_features
+        else:
+            self.loader.get_all_tracks()
+            matrix = self.loader.features
+        precision = precision or self.precision
+        if precision == 'float64':
+            return len(matrix) * matrix.shape[1] * 8
+        if precision == self.precision:
+            return self._reduced_matrix(item_type, metric,
+                                        self._space(item_type, metric, matrix)).nbytes
+        return reduce_precision(matrix, precision, self.chunk_size).nbytes
+    
+    def _query(self, vec, metric):
+        """A query vector (or rows of them) in the space a metric searches"""
+        if self.feature_space == 'raw':
+            return vec
+        return self._get_scaler().transform(vec, metric)
+    
+    def _search_space(self, query_item, item_type):
+        """Get (names, matrix, norms, excluded rows) to search for a query"""
+        if item_type == 'artist':
+            # Compare with all artists
+            names = self.loader.get_all_artists()
+            row = self.loader.get_artist_row(query_item)
+            exclude = [] if row is None else [row]
+            return names, self.loader.artist_features, self.loader.artist_norms, exclude
+        
+        # Compare with all tracks
+        self.loader.get_all_tracks()
+        exclude = self.loader.get_matching_rows(query_item)
+        return self.loader.track_names, self.loader.features, None, exclude
+    
+    def get_top_similar(self, query_item, item_type='track', metric='cosine', top_n=5,
+                        use_ann=False):
+        """Get top N similar items
+
+        use_ann searches tracks through the approximate IVF index (cosine
+        and euclidean only); exact search is the default. Euclidean and
+        manhattan use an exact KD-tree when one is available; other exact
+        scans are sharded across processes when workers > 1. With a float32
+        or int8 precision, search scans the reduced copy instead (reranked
+        when rerank > 0). Results are served from the LRU cache when the
+        same query was answered before.
+        """
+        if metric not in METRICS:
+            print(f"Unknown metric: {metric}. Using cosine.")
+            metric = 'cosine'
+        
+        with registry.timer('get_top_similar', metric=metric, item_type=item_type):
+            version = self.loader.version
+            self.cache.sync(version)
+            key = ('top', query_item, item_type, metric, top_n, use_ann, version)
+            results = self.cache.get(key)
+            registry.count('cache_lookups', kind='top', result='miss' if results is None else 'hit')
+            if results is None:
+                try:
+                    results = self._top_similar(query_item, item_type, metric, top_n, use_ann)
+                except Exception as e:
+                    print(f"Error finding similar items: {e}")
+                    return []
+                self.cache.put(key, results)
+            return list(results)
+    
+    def get_top_similar_many(self, query_items, item_type='track', metric='cosine', top_n=5):
+        """Get top N similar items for several queries with one batched exact scan
+
+        Returns one result list per query, the same as calling
+        get_top_similar for each; cached queries skip the scan.
+        """
+        if metric not in METRICS:
+            print(f"Unknown metric: {metric}. Using cosine.")
+            metric = 'cosine'
+        
+        registry.count('batched_queries', len(query_items), metric=metric, item_type=item_type)
+        version = self.loader.version
+        self.cache.sync(version)
+        results = [None] * len(query_items)
+        for i, query_item in enumerate(query_items):
+            cached = self.cache.get(('top', query_item, item_type, metric, top_n, False, version))
+            if cached is not None:
+                results[i] = list(cached)
+        
+        try:
+            pending, vecs, exclude_queries, exclude_rows = [], [], [], []
+            for i, query_item in enumerate(query_items):
+                if results[i] is not None:
+                    continue
+                names, matrix, _, exclude = self._search_space(query_item, item_type)
+                query_vec = self._get_features(query_item, item_type)
+                if not query_vec or len(names) == 0:
+                    results[i] = []
+                    continue
+                exclude_queries.extend([len(pending)] * len(exclude))
+                exclude_rows.extend(exclude)
+                pending.append(i)
+                vecs.append(query_vec)
+            
+            if pending:
+                rows, scores = self._batched_top_k(item_type, metric,
+                                                   self._space(item_type, metric, matrix),
+                                                   self._query(np.array(vecs), metric), top_n,
+                                                   (exclude_queries, exclude_rows))
+                for j, i in enumerate(pending):
+                    found = rows[j] >= 0
+                    results[i] = [(names[r], score) for r, score
+                                  in zip(rows[j][found].tolist(), scores[j][found].tolist())]
+        except Exception as e:
+            print(f"Error finding similar items: {e}")
+            return [result or [] for result in results]
+        
+        for query_item, result in zip(query_items, results):
+            self.cache.put(('top', query_item, item_type, metric, top_n, False, version), result)
+        return [list(result) for result in results]
+    
+    def _top_similar(self, query_item, item_type, metric, top_n, use_ann):
+        """Search the catalog for get_top_similar, without caching"""
+        with registry.timer('similarity_stage', stage='resolve', item_type=item_type):
+            names, matrix, norms, exclude = self._search_space(query_item, item_type)
+            query_vec = self._get_features(query_item, item_type)
+        if not query_vec or len(names) == 0:
+            return []
+        
+        space = (item_type, self._space_name(metric))
+        kernel = self._kernel(metric)
+        if self.feature_space != 'raw':
+            matrix = self._space(item_type, metric, matrix)
+            query_vec = self._query(query_vec, metric)
+            norms = None
+        
+        tree = None
+        if metric in TREE_METRICS and self.precision == 'float64' and np.isfinite(query_vec).all():
+            tree = self._get_tree(space, matrix)
+        
+        # Scans also record their score/select split inside top_k_scan
+        with registry.timer('similarity_stage', stage='search', metric=metric, item_type=item_type):
+            if use_ann and item_type != 'artist' and metric in ANN_METRICS:
+                candidates = self._get_ann_index(metric).candidates(query_vec, self.ann_probes)
+                local_exclude = np.flatnonzero(np.isin(candidates, exclude))
+                local_rows, scores = top_k_scan(matrix[candidates], query_vec, kernel, top_n,
+                                                local_exclude, self.chunk_size)
+                rows = candidates[local_rows]
+            elif self.precision != 'float64':
+                rows, scores = self._batched_top_k(item_type, metric, matrix, [query_vec], top_n,
+                                                   ([0] * len(exclude), exclude))
+                found = rows[0] >= 0
+                rows, scores = rows[0][found], scores[0][found]
+            elif tree is not None:
+                rows, scores = self._tree_top_k(tree, matrix, query_vec, metric, top_n, exclude)
+            elif self.workers and self.workers > 1:
+                searcher = self._get_searcher(space, matrix)
+                rows, scores = searcher.top_k(query_vec, kernel, top_n, exclude)
+            else:
+                rows, scores = top_k_scan(matrix, query_vec, kernel, top_n, exclude,
+                                          self.chunk_size, norms)
+        return [(names[i], score) for i, score in zip(rows.tolist(), scores.tolist())]
     
-    def get_top_similar(self, query_item, item_type='track', metric='cosine', top_n=5):
-        """Get top N similar items"""
+    def get_similar_within(self, query_item, min_similarity, item_type='track', metric='euclidean'):
+        """Get every item with similarity >= min_similarity, best first
+
+        For euclidean and manhattan the threshold becomes a radius
+        d = 1 / s - 1 around the query, answered by the KD-tree.
+        """
         try:
-            results = []
+            if metric not in METRICS:
+                print(f"Unknown metric: {metric}. Using cosine.")
+                metric = 'cosine'
             
-            if item_type == 'artist':
-                # Compare with all artists
-                artists = self.loader.get_all_artists()
-                for artist in artists:
-                    if artist != query_item:
-                        similarity = self.compute_similarity(
-                            query_item, artist, 'artist', metric
-                        )
-                        if similarity > 0:
-                            results.append((artist, similarity))
+            names, matrix, norms, exclude = self._search_space(query_item, item_type)
+            query_vec = self._get_features(query_item, item_type)
+            if not query_vec or len(names) == 0 or min_similarity > 1:
+                return []
             
-            else:  # track
-                # Compare with all tracks
-                tracks = self.loader.get_all_tracks()
-                for track in tracks:
-                    if track['id'] != query_item and track['name'] != query_item:
-                        similarity = self.compute_similarity(
-                            query_item, track['id'], 'track', metric
-                        )
-                        if similarity > 0:
-                            results.append((track['name'], similarity))
+            space = (item_type, self._space_name(metric))
+            if self.feature_space != 'raw':
+                matrix = self._space(item_type, metric, matrix)
+                query_vec = self._query(query_vec, metric)
+                norms = None
             
-            # Sort by similarity (descending)
-            results.sort(key=lambda x: x[1], reverse=True)
-            return results[:top_n]
+            tree = None
+            if metric in TREE_METRICS and min_similarity > 0 and np.isfinite(query_vec).all():
+                tree = self._get_tree(space, matrix)
+            
+            if tree is not None:
+                radius = similarity_to_distance(min_similarity)
+                rows = np.sort(np.array(
+                    tree.query_ball_point(query_vec, radius * (1 + 1e-9) + 1e-12,
+                                          p=TREE_METRICS[metric]), dtype=np.int64))
+                scores = _KERNELS[metric](matrix[rows], np.asarray(query_vec))
+                keep = (scores >= min_similarity) & ~np.isin(rows, exclude)
+                rows, scores = rows[keep], scores[keep]
+                order = np.lexsort((rows, -scores))
+                rows, scores = rows[order], scores[order]
+            else:
+                rows, scores = threshold_scan(matrix, query_vec, self._kernel(metric), min_similarity,
+                                              exclude, self.chunk_size, norms)
+            return [(names[i], score) for i, score in zip(rows.tolist(), scores.tolist())]
             
         except Exception as e:
             print(f"Error finding similar items: {e}")
-            return []
\ No newline at end of file
+            return []
@@ -0,0 +1,228 @@
+# test_updates.py - Incremental updates and artist parsing against fresh loads (python -m pytest test_updates.py)
+import ast
+import contextlib
+import io
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from load_dataset_module import FEATURE_COLUMNS, DataLoader, _parse_artists_string, _split_artist_list
+from similarity_module import METRICS, SimilarityCalculator
+
+# 'Solo Act' (kept last) is only given to one track, so removing it drops the artist
+ARTIST_POOL = ['Adele', 'Drake', "D'Angelo", 'Tyler, The Creator', 'Beyoncé', 'Sam Smith',
+               'Lady Gaga', 'Frank Ocean', 'Coldplay', 'Dua Lipa', 'The 1975', 'Solo Act']
+NAME_POOL = ['Silent Moon', 'silent moon', 'Broken Soul', 'Summer Sky', 'Midnight Ocean',
+             'Flying Forest', 'Screaming Air', 'Ocean in the Dark']
+
+# Raw artists strings that must parse like ast.literal_eval
+ARTIST_STRINGS = [
+    "['Adele']",
+    "['Adele', 'Drake']",
+    '["D\'Angelo"]',
+    "[ 'Adele' ,'Drake' ]",
+    "['Tyler, The Creator', 'Beyoncé']",
+    "['Adele',]",
+    "[]",
+    "['  padded  ']",
+    "['It\\'s Me']",
+    "['A' 'B']",
+    "['Adele', 1]",
+    "['\\u00e9t\\u00e9']",
+    '["a", \'b\', "c;d"]',
+]
+
+STAGES = ['add', 'remove', 'delta']
+
+# Queries per stage for the top-k comparisons
+TOP_K_QUERIES = 8
+
+
+def make_rows(n, seed=7):
+    """Deterministic catalog rows with duplicate IDs, missing features and shared names"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        artists = rng.sample(ARTIST_POOL[:-1], rng.choice([1, 1, 2, 3]))
+        row = {'id': f't{i:04d}', 'name': rng.choice(NAME_POOL), 'artists': str(artists)}
+        for column in FEATURE_COLUMNS:
+            row[column] = round(rng.uniform(-60, 0) if column == 'loudness' else rng.random(), 4)
+        if i % 17 == 5:
+            row['energy'] = float('nan')
+        rows.append(row)
+    # Duplicated IDs (one within the base, one added later), and an early
+    # artist with a single track whose removal renumbers the others
+    rows[40]['id'] = rows[10]['id']
+    rows[170]['id'] = rows[20]['id']
+    rows[1]['artists'] = str(['Solo Act'])
+    return rows
+
+
+def load(path):
+    loader = DataLoader(path, use_snapshot=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_data()
+    return loader
+
+
+def write_csv(rows, path):
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+def record(track):
+    """A track record as a comparable tuple, NaN as None"""
+    return (track['id'], track['name'],
+            tuple(None if np.isnan(track[c]) else track[c] for c in FEATURE_COLUMNS))
+
+
+def describe(loader):
+    """Order-independent facts about a loaded or updated catalog"""
+    ids = loader.track_ids.tolist()
+    facts = {'tracks': sorted(record(t) for t in loader.get_all_tracks())}
+
+    facts['artists'] = {}
+    for artist in loader.get_all_artists():
+        row = loader.get_artist_row(artist)
+        facts['artists'][artist] = (sorted(t['id'] for t in loader.get_tracks_by_artist(artist)),
+                                    int(loader.artist_track_counts[row]),
+                                    loader.artist_features[row].copy(),
+                                    float(loader.artist_norms[row]))
+    facts['track_artists'] = sorted((ids[r], tuple(sorted(loader.get_track_artists(r))))
+                                    for r in range(len(ids)))
+
+    # Names are queried in every case variant, records compared in full
+    facts['by_name'] = {name: sorted(record(t) for _, t in loader.get_tracks_by_name(name))
+                        for name in NAME_POOL + ['SILENT MOON', 'no such name']}
+    facts['by_id'] = {}
+    for track_id in set(ids) | {'no-such-id'}:
+        track = loader.get_track_by_id(track_id)
+        facts['by_id'][track_id] = None if track is None else record(track)
+    facts['duplicates'] = {track_id: sorted(record(loader.tracks[r]) for r in rows)
+                           for track_id, rows in loader.duplicate_id_rows.items()}
+    facts['duplicate_rows_valid'] = all(
+        len(rows) > 1 and len(set(rows)) == len(rows) and all(ids[r] == track_id for r in rows)
+        and loader.id_to_row[track_id] in rows
+        for track_id, rows in loader.duplicate_id_rows.items())
+    facts['records_in_place'] = all(t.row == r and t['id'] == ids[r]
+                                    for r, t in enumerate(loader.tracks))
+
+    # Rows may be in a different order, so top-k is compared by score
+    with contextlib.redirect_stdout(io.StringIO()):
+        calculator = SimilarityCalculator(loader, cache_size=0)
+        queries = {'artist': sorted(facts['artists'])[:TOP_K_QUERIES],
+                   'track': sorted(set(ids))[::max(1, len(set(ids)) // TOP_K_QUERIES)]}
+        facts['top_k'] = {}
+        for item_type, items in queries.items():
+            for metric in METRICS:
+                for item in items:
+                    facts['top_k'][(item_type, metric, item)] = [
+                        score for _, score in calculator.get_top_similar(item, item_type, metric, 5)]
+                batched = calculator.get_top_similar_many(items, item_type, metric, 5)
+                facts['top_k'][(item_type, metric, 'batched')] = [
+                    score for result in batched for _, score in result]
+    return facts
+
+
+@pytest.fixture(scope='module')
+def stages(tmp_path_factory):
+    """(counts, updated facts, fresh facts) after each update, keyed by stage"""
+    directory = tmp_path_factory.mktemp('updates')
+    rows = make_rows(240)
+    base, added, delta_adds = rows[:160], rows[160:200], rows[200:]
+    results = {}
+
+    loader = load(write_csv(base, directory / 'base.csv'))
+    additions = [dict(row, artists=ast.literal_eval(row['artists'])) for row in added]
+    with contextlib.redirect_stdout(io.StringIO()):
+        count = loader.add_tracks(additions)
+    current = base + added
+    results['add'] = ((count, len(added)), describe(loader),
+                      describe(load(write_csv(current, directory / 'added.csv'))))
+
+    solo = [row['id'] for row in current if row['artists'] == str(['Solo Act'])]
+    nan_ids = [row['id'] for row in current if np.isnan(row['energy'])][:3]
+    gone = [rows[10]['id'], current[0]['id'], current[-1]['id'], 'no-such-id'] + solo + nan_ids \
+        + [row['id'] for row in current[70:90]]
+    expected = sum(row['id'] in gone for row in current)
+    with contextlib.redirect_stdout(io.StringIO()):
+        count = loader.remove_tracks(gone)
+    current = [row for row in current if row['id'] not in gone]
+    results['remove'] = ((count, expected), describe(loader),
+                         describe(load(write_csv(current, directory / 'removed.csv'))))
+
+    removes = [dict(row, op='remove') for row in current[5:25:2]]
+    replaced = dict(current[30], energy=0.123, artists=str(['Adele', 'Solo Act']), op='add')
+    delta = removes + [dict(current[30], op='remove'), replaced] + [dict(row, op='') for row in delta_adds]
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = loader.apply_delta(write_csv(delta, directory / 'delta.csv'))
+    removed_ids = {row['id'] for row in removes} | {replaced['id']}
+    expected = (len(delta_adds) + 1, sum(row['id'] in removed_ids for row in current))
+    current = [row for row in current if row['id'] not in removed_ids]
+    current += [{k: v for k, v in row.items() if k != 'op'} for row in [replaced] + delta_adds]
+    results['delta'] = ((result, expected), describe(loader),
+                        describe(load(write_csv(current, directory / 'delta_applied.csv'))))
+    return results
+
+
+@pytest.mark.parametrize('text', ARTIST_STRINGS)
+def test_artist_list_parses_like_literal_eval(text):
+    assert _parse_artists_string(text) == [str(a).strip() for a in ast.literal_eval(text)]
+    fast = _split_artist_list(text)
+    assert fast is None or fast == ast.literal_eval(text)
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_update_counts(stages, stage):
+    found, expected = stages[stage][0]
+    assert found == expected
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_tracks_and_features(stages, stage):
+    _, updated, fresh = stages[stage]
+    assert updated['tracks'] == fresh['tracks']
+    assert updated['records_in_place']
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_artists_and_centroids(stages, stage):
+    _, updated, fresh = stages[stage]
+    assert updated['artists'].keys() == fresh['artists'].keys()
+    for artist, (track_ids, count, centroid, norm) in fresh['artists'].items():
+        got = updated['artists'][artist]
+        assert got[:2] == (track_ids, count), artist
+        assert np.allclose(got[2], centroid, rtol=1e-9, equal_nan=True), artist
+        assert np.allclose(got[3], norm, rtol=1e-9, equal_nan=True), artist
+    assert updated['track_artists'] == fresh['track_artists']
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_lookups_by_id_and_name(stages, stage):
+    _, updated, fresh = stages[stage]
+    assert updated['by_name'] == fresh['by_name']
+    assert updated['by_id'].keys() == fresh['by_id'].keys()
+    for track_id, expected in fresh['by_id'].items():
+        if track_id in fresh['duplicates']:
+            # Rows of a duplicated ID may change order; any of its tracks will do
+            assert updated['by_id'][track_id] in fresh['duplicates'][track_id]
+        else:
+            assert updated['by_id'][track_id] == expected, track_id
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_duplicate_id_rows(stages, stage):
+    _, updated, fresh = stages[stage]
+    assert updated['duplicates'] == fresh['duplicates']
+    assert updated['duplicate_rows_valid']
+
+
+@pytest.mark.parametrize('stage', STAGES)
+def test_top_k_scores(stages, stage):
+    _, updated, fresh = stages[stage]
+    assert updated['top_k'].keys() == fresh['top_k'].keys()
+    for key, expected in fresh['top_k'].items():
+        got = updated['top_k'][key]
+        assert len(got) == len(expected) and np.allclose(got, expected, rtol=1e-9), key
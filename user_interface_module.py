@@ -3,15 +3,29 @@ user_interface_module.py - GUI for the recommendation engine
 """
 
 import tkinter as tk
+import traceback
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, messagebox
 
+from instrumentation_module import registry
+
+# How often the Tk loop checks the worker pool for finished jobs
+POLL_INTERVAL_MS = 50
+
+# Worker threads; NumPy releases the GIL while scanning, so scans overlap
+WORKER_THREADS = 3
+
 class RecommendationGUI:
     """GUI for the music recommendation engine"""
     
-    def __init__(self, data_loader, similarity_calculator):
+    def __init__(self, data_loader=None, similarity_calculator=None):
         self.loader = data_loader
         self.calculator = similarity_calculator
         
+        # 'ready' once a loader and calculator are attached; see start_loading
+        self.state = 'ready' if data_loader is not None else 'loading'
+        self.load_fraction = None
+        
         # Create main window
         self.root = tk.Tk()
         self.root.title("Music Recommendation Engine")
@@ -23,14 +37,27 @@ class RecommendationGUI:
         self.input1_var = tk.StringVar()
         self.input2_var = tk.StringVar()
         
+        # Similarity work runs off the Tk thread; only one job is current at a time
+        self.executor = ThreadPoolExecutor(max_workers=WORKER_THREADS)
+        self._job = None
+        self._job_id = 0
+        
         # Create widgets
+        self.action_buttons = []
         self.create_widgets()
         
         # Show help message
         self.show_welcome_message()
+        if self.state != 'ready':
+            self._set_controls(False)
     
     def show_welcome_message(self):
         """Show welcome message in results area"""
+        if self.state != 'ready':
+            self.results_text.delete(1.0, tk.END)
+            self.results_text.insert(1.0, "⏳ Loading dataset, controls unlock when it is ready...")
+            return
+        
         welcome_text = """🎵 WELCOME TO MUSIC RECOMMENDATION ENGINE 🎵
 
 HOW TO USE:
@@ -126,21 +153,24 @@ EXAMPLE ARTISTS IN DATABASE:
         style.configure('Success.TButton', font=('Arial', 10, 'bold'))
         style.configure('Info.TButton', font=('Arial', 10))
         
-        ttk.Button(
+        calculate_button = ttk.Button(
             button_frame,
             text="🔍 Calculate Similarity",
             command=self.calculate_similarity,
             width=22,
             style='Success.TButton'
-        ).grid(row=0, column=0, padx=5, pady=5)
+        )
+        calculate_button.grid(row=0, column=0, padx=5, pady=5)
         
-        ttk.Button(
+        recommend_button = ttk.Button(
             button_frame,
             text="💡 Get Recommendations",
             command=self.get_recommendations,
             width=22,
             style='Info.TButton'
-        ).grid(row=0, column=1, padx=5, pady=5)
+        )
+        recommend_button.grid(row=0, column=1, padx=5, pady=5)
+        self.action_buttons += [calculate_button, recommend_button]
         
         ttk.Button(
             button_frame,
@@ -156,6 +186,15 @@ EXAMPLE ARTISTS IN DATABASE:
             width=22
         ).grid(row=1, column=1, padx=5, pady=5)
         
+        self.cancel_button = ttk.Button(
+            button_frame,
+            text="⛔ Cancel",
+            command=self.cancel_job,
+            width=22,
+            state=tk.DISABLED
+        )
+        self.cancel_button.grid(row=2, column=0, columnspan=2, padx=5, pady=5)
+        
         # Results area
         results_label = ttk.Label(main_frame, text="Results:", 
                                  font=("Arial", 12, "bold"))
@@ -201,6 +240,10 @@ EXAMPLE ARTISTS IN DATABASE:
             font=("Arial", 9)
         )
         status_bar.grid(row=8, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        
+        # Busy indicator while a job is running
+        self.progress = ttk.Progressbar(main_frame, mode='indeterminate')
+        self.progress.grid(row=9, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(5, 0))
     
     def create_input_fields(self, parent):
         """Create input fields"""
@@ -219,12 +262,14 @@ EXAMPLE ARTISTS IN DATABASE:
         self.input1_entry.grid(row=3, column=1, sticky=tk.W, pady=5)
         
         # Add sample button for item 1
-        ttk.Button(
+        sample_button = ttk.Button(
             parent,
             text="Sample",
             command=lambda: self.input1_var.set(self.get_sample_item()),
             width=8
-        ).grid(row=3, column=1, sticky=tk.E, padx=5)
+        )
+        sample_button.grid(row=3, column=1, sticky=tk.E, padx=5)
+        self.action_buttons.append(sample_button)
         
         # Item 2
         ttk.Label(parent, text="Item 2 (for comparison):", 
@@ -241,12 +286,14 @@ EXAMPLE ARTISTS IN DATABASE:
         self.input2_entry.grid(row=4, column=1, sticky=tk.W, pady=5)
         
         # Add sample button for item 2
-        ttk.Button(
+        sample_button = ttk.Button(
             parent,
             text="Sample",
             command=lambda: self.input2_var.set(self.get_sample_item()),
             width=8
-        ).grid(row=4, column=1, sticky=tk.E, padx=5)
+        )
+        sample_button.grid(row=4, column=1, sticky=tk.E, padx=5)
+        self.action_buttons.append(sample_button)
     
     def get_sample_item(self):
         """Get a sample item based on selected type"""
@@ -285,77 +332,68 @@ EXAMPLE ARTISTS IN DATABASE:
                                  "Please enter both items to compare")
             return
         
-        try:
-            self.status_var.set("🔄 Calculating similarity...")
-            self.root.update()  # Update GUI to show status
-            
-            metric = self.metric_var.get()
-            item_type = self.type_var.get()
-            
-            # Calculate similarity
-            similarity = self.calculator.compute_similarity(
-                item1, item2, item_type, metric
-            )
-            
-            if similarity == 0:
-                messagebox.showinfo("No Match", 
-                                  f"Could not find '{item1}' or '{item2}'\n"
-                                  f"Try using sample artists from the list.")
-                self.status_var.set("❌ Items not found")
-                return
-            
-            # Get top 5 similar for each
-            top5_1 = self.calculator.get_top_similar(item1, item_type, metric, 5)
-            top5_2 = self.calculator.get_top_similar(item2, item_type, metric, 5)
-            
-            # Display results
-            result_text = "=" * 70 + "\n"
-            result_text += "SIMILARITY RESULTS\n"
-            result_text += "=" * 70 + "\n\n"
-            result_text += f"📊 METRIC: {metric.upper()}\n"
-            result_text += f"🎯 TYPE: {item_type.upper()}S\n\n"
-            result_text += f"🔗 Similarity between:\n"
-            result_text += f"   • '{item1}'\n"
-            result_text += f"   • '{item2}'\n\n"
-            result_text += f"⭐ SIMILARITY SCORE: {similarity:.4f}\n\n"
-            
-            if similarity > 0.7:
-                result_text += "💡 Interpretation: Highly Similar\n"
-            elif similarity > 0.4:
-                result_text += "💡 Interpretation: Moderately Similar\n"
-            else:
-                result_text += "💡 Interpretation: Not Very Similar\n"
-            
-            result_text += "\n" + "=" * 70 + "\n"
-            result_text += "TOP 5 RECOMMENDATIONS\n"
-            result_text += "=" * 70 + "\n\n"
-            
-            result_text += f"🎤 Top 5 similar to '{item1}':\n"
-            if top5_1:
-                for name, score in top5_1:
-                    result_text += f"   • {name}: {score:.4f}\n"
-            else:
-                result_text += "   No similar items found\n"
-            
-            result_text += f"\n🎤 Top 5 similar to '{item2}':\n"
-            if top5_2:
-                for name, score in top5_2:
-                    result_text += f"   • {name}: {score:.4f}\n"
-            else:
-                result_text += "   No similar items found\n"
-            
-            self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(1.0, result_text)
-            self.status_var.set(f"✅ Similarity calculated: {similarity:.4f}")
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred:\n{str(e)}")
-            self.status_var.set("❌ Error occurred")
-            # Show traceback in results
-            import traceback
-            error_details = traceback.format_exc()
-            self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(1.0, f"ERROR DETAILS:\n{error_details}")
+        metric = self.metric_var.get()
+        item_type = self.type_var.get()
+        
+        # The pair score and both top-5 scans run concurrently
+        self.start_job("🔄 Calculating similarity...", {
+            'similarity': lambda: self.calculator.compute_similarity(item1, item2, item_type, metric),
+            'top5_1': lambda: self.calculator.get_top_similar(item1, item_type, metric, 5),
+            'top5_2': lambda: self.calculator.get_top_similar(item2, item_type, metric, 5)
+        }, lambda results: self.show_similarity(item1, item2, item_type, metric, results))
+    
+    def show_similarity(self, item1, item2, item_type, metric, results):
+        """Display the results of calculate_similarity"""
+        similarity = results['similarity']
+        top5_1 = results['top5_1']
+        top5_2 = results['top5_2']
+        
+        if similarity == 0:
+            messagebox.showinfo("No Match", 
+                              f"Could not find '{item1}' or '{item2}'\n"
+                              f"Try using sample artists from the list.")
+            self.status_var.set("❌ Items not found")
+            return
+        
+        # Display results
+        result_text = "=" * 70 + "\n"
+        result_text += "SIMILARITY RESULTS\n"
+        result_text += "=" * 70 + "\n\n"
+        result_text += f"📊 METRIC: {metric.upper()}\n"
+        result_text += f"🎯 TYPE: {item_type.upper()}S\n\n"
+        result_text += f"🔗 Similarity between:\n"
+        result_text += f"   • '{item1}'\n"
+        result_text += f"   • '{item2}'\n\n"
+        result_text += f"⭐ SIMILARITY SCORE: {similarity:.4f}\n\n"
+        
+        if similarity > 0.7:
+            result_text += "💡 Interpretation: Highly Similar\n"
+        elif similarity > 0.4:
+            result_text += "💡 Interpretation: Moderately Similar\n"
+        else:
+            result_text += "💡 Interpretation: Not Very Similar\n"
+        
+        result_text += "\n" + "=" * 70 + "\n"
+        result_text += "TOP 5 RECOMMENDATIONS\n"
+        result_text += "=" * 70 + "\n\n"
+        
+        result_text += f"🎤 Top 5 similar to '{item1}':\n"
+        if top5_1:
+            for name, score in top5_1:
+                result_text += f"   • {name}: {score:.4f}\n"
+        else:
+            result_text += "   No similar items found\n"
+        
+        result_text += f"\n🎤 Top 5 similar to '{item2}':\n"
+        if top5_2:
+            for name, score in top5_2:
+                result_text += f"   • {name}: {score:.4f}\n"
+        else:
+            result_text += "   No similar items found\n"
+        
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(1.0, result_text)
+        self.status_var.set(f"✅ Similarity calculated: {similarity:.4f}")
     
     def get_recommendations(self):
         """Get recommendations for a single item"""
@@ -366,61 +404,176 @@ EXAMPLE ARTISTS IN DATABASE:
                                  "Please enter an item to get recommendations")
             return
         
-        try:
-            self.status_var.set("🔄 Generating recommendations...")
-            self.root.update()
-            
-            metric = self.metric_var.get()
-            item_type = self.type_var.get()
-            
-            # Get recommendations
-            recommendations = self.calculator.get_top_similar(
-                item1, item_type, metric, 10
-            )
+        metric = self.metric_var.get()
+        item_type = self.type_var.get()
+        
+        self.start_job("🔄 Generating recommendations...", {
+            'recommendations': lambda: self.calculator.get_top_similar(item1, item_type, metric, 10)
+        }, lambda results: self.show_recommendations(item1, item_type, metric,
+                                                     results['recommendations']))
+    
+    def show_recommendations(self, item1, item_type, metric, recommendations):
+        """Display the results of get_recommendations"""
+        # Display results
+        result_text = "=" * 70 + "\n"
+        result_text += "RECOMMENDATION RESULTS\n"
+        result_text += "=" * 70 + "\n\n"
+        result_text += f"🎯 FOR: {item1}\n"
+        result_text += f"📊 TYPE: {item_type.upper()}\n"
+        result_text += f"⚙️ METRIC: {metric.upper()}\n\n"
+        
+        if recommendations:
+            result_text += f"🏆 TOP 10 RECOMMENDATIONS:\n\n"
+            for i, (name, score) in enumerate(recommendations, 1):
+                # Color code based on score
+                if score > 0.8:
+                    prefix = "🔥 "
+                elif score > 0.6:
+                    prefix = "⭐ "
+                elif score > 0.4:
+                    prefix = "✓ "
+                else:
+                    prefix = "• "
+                
+                result_text += f"{i:2}. {prefix}{name[:45]}: {score:.4f}\n"
             
-            # Display results
-            result_text = "=" * 70 + "\n"
-            result_text += "RECOMMENDATION RESULTS\n"
-            result_text += "=" * 70 + "\n\n"
-            result_text += f"🎯 FOR: {item1}\n"
-            result_text += f"📊 TYPE: {item_type.upper()}\n"
-            result_text += f"⚙️ METRIC: {metric.upper()}\n\n"
+            # Calculate average score
+            avg_score = sum(score for _, score in recommendations) / len(recommendations)
+            result_text += f"\n📈 Average recommendation score: {avg_score:.4f}"
             
+            # Show strongest recommendation
             if recommendations:
-                result_text += f"🏆 TOP 10 RECOMMENDATIONS:\n\n"
-                for i, (name, score) in enumerate(recommendations, 1):
-                    # Color code based on score
-                    if score > 0.8:
-                        prefix = "🔥 "
-                    elif score > 0.6:
-                        prefix = "⭐ "
-                    elif score > 0.4:
-                        prefix = "✓ "
-                    else:
-                        prefix = "• "
-                    
-                    result_text += f"{i:2}. {prefix}{name[:45]}: {score:.4f}\n"
-                
-                # Calculate average score
-                avg_score = sum(score for _, score in recommendations) / len(recommendations)
-                result_text += f"\n📈 Average recommendation score: {avg_score:.4f}"
-                
-                # Show strongest recommendation
-                if recommendations:
-                    best_name, best_score = recommendations[0]
-                    result_text += f"\n\n🏅 STRONGEST RECOMMENDATION:\n"
-                    result_text += f"   '{best_name}' with score: {best_score:.4f}"
-            else:
-                result_text += "❌ No recommendations found\n"
-                result_text += "\n💡 Try using a different item or check your input."
-            
+                best_name, best_score = recommendations[0]
+                result_text += f"\n\n🏅 STRONGEST RECOMMENDATION:\n"
+                result_text += f"   '{best_name}' with score: {best_score:.4f}"
+        else:
+            result_text += "❌ No recommendations found\n"
+            result_text += "\n💡 Try using a different item or check your input."
+        
+        self.results_text.delete(1.0, tk.END)
+        self.results_text.insert(1.0, result_text)
+        self.status_var.set(f"✅ Generated {len(recommendations)} recommendations")
+    
+    def _set_controls(self, enabled):
+        """Enable or disable every button that needs the dataset"""
+        for button in self.action_buttons:
+            button.config(state=tk.NORMAL if enabled else tk.DISABLED)
+    
+    def report_load_progress(self, rows_loaded, fraction):
+        """DataLoader progress callback; safe to call from the loading thread"""
+        self.load_fraction = fraction
+    
+    def start_loading(self, load, on_ready=None):
+        """Run load() -> (loader, calculator) in the background while the window is up
+
+        The controls stay disabled until it returns; on_ready(app) is
+        called on the Tk thread once they are enabled.
+        """
+        self.state = 'loading'
+        self._set_controls(False)
+        self.status_var.set("⏳ Loading dataset...")
+        self.progress.config(mode='determinate', maximum=1.0, value=0)
+        future = self.executor.submit(load)
+        self.root.after(POLL_INTERVAL_MS, self._poll_loading, future, on_ready)
+    
+    def _poll_loading(self, future, on_ready):
+        """Follow a background load from the Tk loop"""
+        if not future.done():
+            if self.load_fraction is not None:
+                self.progress['value'] = self.load_fraction
+                self.status_var.set(f"⏳ Loading dataset... {self.load_fraction:.0%}")
+            self.root.after(POLL_INTERVAL_MS, self._poll_loading, future, on_ready)
+            return
+        
+        self.progress.config(mode='indeterminate', value=0)
+        try:
+            self.loader, self.calculator = future.result()
+        except Exception as e:
+            self.state = 'failed'
+            self.status_var.set("❌ Failed to load dataset")
             self.results_text.delete(1.0, tk.END)
-            self.results_text.insert(1.0, result_text)
-            self.status_var.set(f"✅ Generated {len(recommendations)} recommendations")
-            
+            self.results_text.insert(1.0, f"Could not load the dataset:\n{e}")
+            if on_ready is not None:
+                on_ready(self)
+            return
+        
+        self.state = 'ready'
+        self._set_controls(True)
+        self.show_welcome_message()
+        self.status_var.set(f"✅ Ready - {len(self.loader.get_all_artists())} artists loaded")
+        if on_ready is not None:
+            on_ready(self)
+    
+    def start_job(self, status, tasks, on_done):
+        """Run named tasks on the worker pool, then call on_done(results) on the Tk thread
+
+        Starting a job cancels the one before it, so a stale query can never
+        overwrite newer results.
+        """
+        self.cancel_job(quiet=True)
+        self._job_id += 1
+        self._job = {
+            'id': self._job_id,
+            'futures': {name: self.executor.submit(task) for name, task in tasks.items()},
+            'on_done': on_done
+        }
+        self.status_var.set(status)
+        self.progress.start(10)
+        self.cancel_button.config(state=tk.NORMAL)
+        self.root.after(POLL_INTERVAL_MS, self._poll_job, self._job_id)
+    
+    def _poll_job(self, job_id):
+        """Check the current job from the Tk loop; deliver its results when all are done"""
+        job = self._job
+        if job is None or job['id'] != job_id:
+            return  # Cancelled or replaced
+        
+        if not all(future.done() for future in job['futures'].values()):
+            self.root.after(POLL_INTERVAL_MS, self._poll_job, job_id)
+            return
+        
+        self._end_job()
+        try:
+            results = {name: future.result() for name, future in job['futures'].items()}
+            job['on_done'](results)
+            if registry.enabled:
+                self.status_var.set(self.status_var.get() + self._latency_text())
         except Exception as e:
             messagebox.showerror("Error", f"An error occurred:\n{str(e)}")
             self.status_var.set("❌ Error occurred")
+            # Show traceback in results
+            error_details = ''.join(traceback.format_exception(type(e), e, e.__traceback__))
+            self.results_text.delete(1.0, tk.END)
+            self.results_text.insert(1.0, f"ERROR DETAILS:\n{error_details}")
+    
+    def _latency_text(self):
+        """Top-k latency percentiles for the selected metric and type, for the status bar"""
+        timer = registry.timer_summary('get_top_similar', metric=self.metric_var.get(),
+                                       item_type=self.type_var.get())
+        if timer is None:
+            return ""
+        return (f"  |  top-k p50 {timer['p50'] * 1000:.1f} ms, p95 {timer['p95'] * 1000:.1f} ms, "
+                f"p99 {timer['p99'] * 1000:.1f} ms ({timer['count']} calls)")
+    
+    def _end_job(self):
+        """Forget the current job and reset the busy indicators"""
+        self._job = None
+        self.progress.stop()
+        self.cancel_button.config(state=tk.DISABLED)
+    
+    def cancel_job(self, quiet=False):
+        """Cancel the current job
+
+        Queued tasks never start; a scan already running finishes in the
+        background and its results are discarded.
+        """
+        if self._job is None:
+            return
+        for future in self._job['futures'].values():
+            future.cancel()
+        self._end_job()
+        if not quiet:
+            self.status_var.set("⛔ Cancelled")
     
     def clear_results(self):
         """Clear all results"""
@@ -484,4 +637,7 @@ EXAMPLE ARTISTS IN DATABASE:
     
     def run(self):
         """Run the GUI application"""
-        self.root.mainloop()
\ No newline at end of file
+        try:
+            self.root.mainloop()
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
\ No newline at end of file